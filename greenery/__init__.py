@@ -1,4 +1,4 @@
 # -*- coding: utf-8 -*-
 
-__all__ = ["fsm", "lego"]
+__all__ = ["fsm", "lego", "sfsm", "utf8", "glushkov", "lazydfa", "counting", "matcher", "prefilter", "ruleset", "multidfa", "lexer", "tdfa", "levenshtein", "fst", "tokenindex"]
 from ._version import __version__
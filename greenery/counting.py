@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+'''
+	Counting automata, for bounded repetition without unrolling.
+
+	`mult.to_fsm()` turns "[^,]{1,255}" into 256 states, and intersecting
+	several such fields multiplies those numbers together. A counting automaton
+	is a Glushkov automaton (see `glushkov`) in which a repeated charclass is a
+	single position carrying a counter instead. Entering the position from
+	elsewhere sets its counter to 1, reading another matching character
+	increments it (up to the maximum), and leaving it is only possible once the
+	counter has reached the minimum.
+
+	Since several runs of the automaton can be at the same position with
+	different counts, each active position holds a *set* of counter values,
+	stored as a Python int with bit v set if the count v is possible.
+	Incrementing every count at once is then a single shift.
+'''
+
+from greenery import fsm, glushkov, sfsm
+
+class counting:
+	'''
+		A counting automaton. `labels`, `follow` and `finals` are as for a
+		`glushkov` automaton, except that the repetition of a counted position
+		is not in `follow`. `bounds` maps each counted position to its (min, max)
+		counts, max being None for an unlimited count.
+		A configuration of the automaton is a dict from each active position to
+		its set of counts, as a bitmask (1 for an uncounted position).
+	'''
+	def __setattr__(self, name, value):
+		'''Immutability prevents some potential problems.'''
+		raise Exception("This object is immutable.")
+
+	def __init__(self, labels, follow, finals, bounds):
+		for p in bounds:
+			(min, max) = bounds[p]
+			if p == 0 or max is not None and (max < 2 or max < min):
+				raise Exception("Invalid bounds " + repr(bounds[p]) + " for position " + repr(p))
+		self.__dict__["labels"] = tuple(labels)
+		self.__dict__["follow"] = tuple(frozenset(f) for f in follow)
+		self.__dict__["finals"] = frozenset(finals)
+		self.__dict__["bounds"] = dict(bounds)
+		self.__dict__["initial"] = {0: 1}
+
+	def _increment(self, p, counts):
+		'''
+			Add one to every count in `counts`. Counts beyond the maximum are
+			dropped; for an unlimited maximum, every count at or above the
+			minimum behaves the same, so they are merged into the minimum.
+		'''
+		(min, max) = self.bounds[p]
+		counts <<= 1
+		if max is not None:
+			return counts & ((1 << (max + 1)) - 1)
+		cap = min if min > 1 else 1
+		if counts >> cap:
+			counts = (counts & ((1 << cap) - 1)) | (1 << cap)
+		return counts
+
+	def _done(self, p, counts):
+		'''Whether a run may leave position p, having counted `counts`.'''
+		if p not in self.bounds:
+			return True
+		return counts >> self.bounds[p][0] != 0
+
+	def step(self, config, symbol):
+		'''
+			Return the configuration reached from `config` by reading `symbol`,
+			which may be `fsm.anything_else`.
+		'''
+		next = {}
+		for (p, counts) in config.items():
+			if p in self.bounds:
+				if _matches(self.labels[p], symbol):
+					incremented = self._increment(p, counts)
+					if incremented:
+						next[p] = next.get(p, 0) | incremented
+				if not self._done(p, counts):
+					continue
+			for q in self.follow[p]:
+				if _matches(self.labels[q], symbol):
+					next[q] = next.get(q, 0) | (2 if q in self.bounds else 1)
+		return next
+
+	def final(self, config):
+		for (p, counts) in config.items():
+			if p in self.finals and self._done(p, counts):
+				return True
+		return False
+
+	def accepts(self, input):
+		config = self.initial
+		for symbol in input:
+			config = self.step(config, symbol)
+			if len(config) == 0:
+				return False
+		return self.final(config)
+
+	def __contains__(self, string):
+		return self.accepts(string)
+
+	def empty(self):
+		'''
+			A counted position can always count up to its minimum, because its
+			charclass isn't empty, so counters never block the way to a final
+			position: emptiness is plain reachability.
+		'''
+		reachable = {0}
+		stack = [0]
+		while len(stack) > 0:
+			p = stack.pop()
+			if p in self.finals:
+				return False
+			for q in self.follow[p]:
+				if q not in reachable:
+					reachable.add(q)
+					stack.append(q)
+		return True
+
+	def isdisjoint(self, other):
+		'''
+			True if no string is accepted by both counting automata. Explores
+			the product of the two on the fly, one character per minterm of all
+			the charclasses involved, without unrolling any counter.
+		'''
+		chars = [
+			_representative(region)
+			for (region, indices) in sfsm.minterms(list(self.labels[1:]) + list(other.labels[1:]))
+		]
+		start = (_freeze(self.initial), _freeze(other.initial))
+		seen = {start}
+		stack = [start]
+		while len(stack) > 0:
+			(a, b) = stack.pop()
+			(a, b) = (dict(a), dict(b))
+			if self.final(a) and other.final(b):
+				return False
+			for char in chars:
+				nexta = self.step(a, char)
+				if len(nexta) == 0:
+					continue
+				nextb = other.step(b, char)
+				if len(nextb) == 0:
+					continue
+				next = (_freeze(nexta), _freeze(nextb))
+				if next not in seen:
+					seen.add(next)
+					stack.append(next)
+		return True
+
+	def to_fsm(self, alphabet=None):
+		'''
+			Expand the counters into an ordinary FSM, e.g. for minimisation or
+			for conversion back to a regular expression. This is where the
+			states which counting saved come back.
+		'''
+		if alphabet is None:
+			alphabet = {fsm.anything_else}
+			for label in self.labels[1:]:
+				alphabet |= label.alphabet()
+
+		def final(state):
+			return self.final(dict(state))
+
+		def follow(state, symbol):
+			next = self.step(dict(state), symbol)
+			if len(next) == 0:
+				raise fsm.OblivionError
+			return _freeze(next)
+
+		return fsm.crawl(alphabet, _freeze(self.initial), final, follow)
+
+def from_lego(piece):
+	'''
+		Build a counting automaton from a lego piece. Every charclass repeated
+		more than once becomes a single counted position.
+	'''
+	labels = [None]
+	follow = [set()]
+	bounds = {}
+	(nullable, first, last) = glushkov._positions(piece, labels, follow, bounds)
+	follow[0] = first
+	finals = set(last)
+	if nullable:
+		finals.add(0)
+	return counting(labels, follow, finals, bounds)
+
+def _matches(label, symbol):
+	if symbol is fsm.anything_else:
+		return label.negated
+	return symbol in label
+
+def _freeze(config):
+	return frozenset(config.items())
+
+def _representative(region):
+	'''Return some character matched by the non-empty charclass `region`.'''
+	if not region.negated:
+		return chr(region.ranges[0][0])
+	i = 0
+	for (first, last) in region.ranges:
+		if i < first:
+			break
+		i = last + 1
+	return chr(i)
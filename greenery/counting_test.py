@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+	raise Exception("Test files can't be run directly. Use `python -m pytest greenery`")
+
+from greenery.lego import parse
+from greenery.counting import from_lego
+
+def test_counting_positions():
+	c = from_lego(parse("[^,]{1,255}(,[^,]{1,255})*"))
+	assert len(c.labels) == 4
+	assert sorted(c.bounds.values()) == [(1, 255), (1, 255)]
+	assert from_lego(parse("x[ab]{2,}y")).bounds == {2: (2, None)}
+	assert from_lego(parse("ab?")).bounds == {}
+
+def test_counting_accepts():
+	c = from_lego(parse("[^,]{1,255}(,[^,]{1,255})*"))
+	assert c.accepts("a" * 255)
+	assert c.accepts("a,bb," + "c" * 255)
+	assert not c.accepts("a" * 256)
+	assert not c.accepts("a,,b")
+	assert not c.accepts("")
+
+	c = from_lego(parse("(a{2,3})*"))
+	for n in range(10):
+		assert c.accepts("a" * n) == (n != 1)
+
+	for string in ["a{2,3}", "(a|b{2,4}){2}", "x[ab]{2,}y", "a{0,3}b"]:
+		piece = parse(string)
+		assert from_lego(piece).to_fsm().equivalent(piece.to_fsm())
+
+def test_counting_intersection():
+	fields = from_lego(parse("[^,]{1,255}(,[^,]{1,255}){3}"))
+	assert not fields.empty()
+	assert from_lego(parse("a[]{2,3}b")).empty()
+	assert not from_lego(parse(".{0,4096}")).isdisjoint(fields)
+	assert from_lego(parse("[a-z]{256}")).isdisjoint(fields)
+	assert not from_lego(parse("[a-z]{255}")).isdisjoint(from_lego(parse("[^,]{1,255}")))
+	assert from_lego(parse("a{3}")).isdisjoint(from_lego(parse("a{4,}")))
@@ -4,6 +4,8 @@
 	Finite state machine library.
 '''
 
+import itertools
+
 class anything_else:
 	'''
 		This is a surrogate symbol which you can use in your finite state machines
@@ -171,6 +173,7 @@ class fsm:
 		'''
 			Concatenate arbitrarily many finite state machines together.
 		'''
+		fsms = _deterministic(fsms)
 		alphabet = set().union(*[fsm.alphabet for fsm in fsms])
 
 		# Use a superset containing states from all FSMs at once.
@@ -228,7 +231,11 @@ class fsm:
 		'''
 		alphabet = self.alphabet
 
-		initial = self.finals
+		# Start from the original initial state, not from the final states:
+		# transitions out of a final state other than the initial one mustn't
+		# be available before anything has been read, see (a|ab)* for example.
+		# The empty string is accepted separately, below.
+		initial = frozenset([self.initial])
 
 		def follow(state, symbol):
 			next = set()
@@ -251,7 +258,7 @@ class fsm:
 		def final(state):
 			return any(substate in self.finals for substate in state)
 
-		return crawl(alphabet, initial, final, follow)
+		return epsilon(alphabet) | crawl(alphabet, initial, final, follow)
 
 	def times(self, multiplier):
 		'''
@@ -426,6 +433,25 @@ class fsm:
 			i += 1
 		return False
 
+	def live(self):
+		'''
+			Return the set of all live states at once, by searching backwards
+			from the final states, which is much cheaper than calling
+			`islive()` on each state in turn.
+		'''
+		incoming = {}
+		for state in self.map:
+			for next in self.map[state].values():
+				incoming.setdefault(next, set()).add(state)
+		live = set(self.finals)
+		stack = list(self.finals)
+		while len(stack) > 0:
+			for previous in incoming.get(stack.pop(), ()):
+				if previous not in live:
+					live.add(previous)
+					stack.append(previous)
+		return live
+
 	def empty(self):
 		'''
 			An FSM is empty if it recognises no strings. An FSM may be arbitrarily
@@ -638,6 +664,331 @@ class fsm:
 			map      = self.map,
 		)
 
+	def to_nfa(self):
+		'''
+			View the present FSM as an NFA, so that it can take part in cheap
+			structural operations (see `nfa`).
+		'''
+		return nfa(
+			alphabet = self.alphabet,
+			states   = self.states,
+			initial  = self.initial,
+			finals   = self.finals,
+			map      = dict(
+				(state, dict(
+					(symbol, {self.map[state][symbol]})
+					for symbol in self.map[state]
+				))
+				for state in self.map
+			),
+		)
+
+class nfa:
+	'''
+		A nondeterministic FSM. `map[state][symbol]` is a set of next states,
+		and `epsilons[state]` is the set of states which can be entered from
+		`state` without reading a symbol.
+		Concatenation, alternation, Kleene star, multiplication and reversal are
+		carried out structurally, in time proportional to the size of the NFAs
+		involved. Subset construction only happens once something genuinely
+		needs a DFA, such as complementation, intersection, minimisation or
+		to_fsm() itself, so a long chain of cheap operations is determinised
+		only once, at the end.
+	'''
+	def __setattr__(self, name, value):
+		'''Immutability prevents some potential problems.'''
+		raise Exception("This object is immutable.")
+
+	def __init__(self, alphabet, states, initial, finals, map, epsilons=None):
+		epsilons = dict(epsilons or {})
+		if not initial in states:
+			raise Exception("Initial state " + repr(initial) + " must be one of " + repr(states))
+		if not finals.issubset(states):
+			raise Exception("Final states " + repr(finals) + " must be a subset of " + repr(states))
+		for state in map.keys():
+			for symbol in map[state]:
+				if not map[state][symbol].issubset(states):
+					raise Exception("Transition for state " + repr(state) + " and symbol " + repr(symbol) + " leads to " + repr(map[state][symbol]) + ", which are not all states")
+		for state in epsilons.keys():
+			if not epsilons[state].issubset(states):
+				raise Exception("Epsilon transition for state " + repr(state) + " leads to " + repr(epsilons[state]) + ", which are not all states")
+
+		self.__dict__["alphabet"] = set(alphabet)
+		self.__dict__["states"  ] = set(states)
+		self.__dict__["initial" ] = initial
+		self.__dict__["finals"  ] = set(finals)
+		self.__dict__["map"     ] = map
+		self.__dict__["epsilons"] = epsilons
+
+	def closure(self, states):
+		'''
+			Return the set of states reachable from `states` using only epsilon
+			transitions, `states` included.
+		'''
+		closure = set(states)
+		stack = list(states)
+		while len(stack) > 0:
+			state = stack.pop()
+			for next in self.epsilons.get(state, ()):
+				if next not in closure:
+					closure.add(next)
+					stack.append(next)
+		return frozenset(closure)
+
+	def step(self, current, symbol):
+		'''
+			Return the epsilon closure of the states reachable from the set
+			`current` by reading `symbol`.
+		'''
+		next = set()
+		for state in current:
+			if state in self.map and symbol in self.map[state]:
+				next.update(self.map[state][symbol])
+		return self.closure(next)
+
+	def accepts(self, input):
+		'''
+			Simulate the NFA directly, without building a DFA. As with `fsm`,
+			symbols not in the alphabet are converted to `anything_else`.
+		'''
+		current = self.closure([self.initial])
+		for symbol in input:
+			if anything_else in self.alphabet and not symbol in self.alphabet:
+				symbol = anything_else
+			current = self.step(current, symbol)
+			if len(current) == 0:
+				return False
+		return not current.isdisjoint(self.finals)
+
+	def __contains__(self, string):
+		return self.accepts(string)
+
+	def __repr__(self):
+		string = "nfa("
+		string += "alphabet = " + repr(self.alphabet)
+		string += ", states = " + repr(self.states)
+		string += ", initial = " + repr(self.initial)
+		string += ", finals = " + repr(self.finals)
+		string += ", map = " + repr(self.map)
+		string += ", epsilons = " + repr(self.epsilons)
+		string += ")"
+		return string
+
+	def to_fsm(self):
+		'''
+			Determinise the present NFA by subset construction. The result is not
+			minimised: call reduce() on it if need be.
+		'''
+		def final(state):
+			return not state.isdisjoint(self.finals)
+
+		def follow(current, symbol):
+			next = self.step(current, symbol)
+			if len(next) == 0:
+				raise OblivionError
+			return next
+
+		return crawl(self.alphabet, self.closure([self.initial]), final, follow)
+
+	def to_nfa(self):
+		return self
+
+	def reduce(self):
+		'''Minimisation needs a DFA, so this returns an `fsm`.'''
+		return self.to_fsm().reduce()
+
+	def concatenate(*nfas):
+		'''
+			Concatenate arbitrarily many NFAs (or FSMs) together, by adding epsilon
+			transitions from the final states of each to the initial state of the
+			next.
+		'''
+		nfas = [n.to_nfa() for n in nfas]
+		(alphabet, states, map, epsilons, renumbered) = _disjoint(nfas)
+		for i in range(len(nfas) - 1):
+			for final in nfas[i].finals:
+				epsilons.setdefault(renumbered[i][final], set()).add(renumbered[i + 1][nfas[i + 1].initial])
+		return nfa(
+			alphabet = alphabet,
+			states   = states,
+			initial  = renumbered[0][nfas[0].initial],
+			finals   = set(renumbered[-1][final] for final in nfas[-1].finals),
+			map      = map,
+			epsilons = epsilons,
+		)
+
+	def __add__(self, other):
+		return self.concatenate(other)
+
+	def union(*nfas):
+		'''
+			Alternate between arbitrarily many NFAs (or FSMs), using a new initial
+			state with epsilon transitions to each of their initial states.
+		'''
+		nfas = [n.to_nfa() for n in nfas]
+		(alphabet, states, map, epsilons, renumbered) = _disjoint(nfas)
+		initial = len(states)
+		states.add(initial)
+		epsilons[initial] = set(renumbered[i][n.initial] for (i, n) in enumerate(nfas))
+		return nfa(
+			alphabet = alphabet,
+			states   = states,
+			initial  = initial,
+			finals   = set(
+				renumbered[i][final]
+				for (i, n) in enumerate(nfas)
+				for final in n.finals
+			),
+			map      = map,
+			epsilons = epsilons,
+		)
+
+	def __or__(self, other):
+		return self.union(other)
+
+	def star(self):
+		'''
+			Kleene star closure. A new initial state, which is final, leads to the
+			old initial state, and every final state leads back to the new one.
+		'''
+		(alphabet, states, map, epsilons, renumbered) = _disjoint([self])
+		initial = len(states)
+		states.add(initial)
+		epsilons[initial] = {renumbered[0][self.initial]}
+		for final in self.finals:
+			epsilons.setdefault(renumbered[0][final], set()).add(initial)
+		return nfa(
+			alphabet = alphabet,
+			states   = states,
+			initial  = initial,
+			finals   = {initial},
+			map      = map,
+			epsilons = epsilons,
+		)
+
+	def times(self, multiplier):
+		if multiplier < 0:
+			raise Exception("Can't multiply an NFA by " + repr(multiplier))
+		return nfa_epsilon(self.alphabet).concatenate(*([self] * multiplier))
+
+	def __mul__(self, multiplier):
+		return self.times(multiplier)
+
+	def reversed(self):
+		'''
+			Reverse every transition. A new initial state leads to each of the old
+			final states, and the old initial state is the only final state.
+		'''
+		(alphabet, states, forwards, forwardepsilons, renumbered) = _disjoint([self])
+		map = {}
+		for state in forwards:
+			for symbol in forwards[state]:
+				for next in forwards[state][symbol]:
+					map.setdefault(next, {}).setdefault(symbol, set()).add(state)
+		epsilons = {}
+		for state in forwardepsilons:
+			for next in forwardepsilons[state]:
+				epsilons.setdefault(next, set()).add(state)
+		initial = len(states)
+		states.add(initial)
+		epsilons[initial] = set(renumbered[0][final] for final in self.finals)
+		return nfa(
+			alphabet = alphabet,
+			states   = states,
+			initial  = initial,
+			finals   = {renumbered[0][self.initial]},
+			map      = map,
+			epsilons = epsilons,
+		)
+
+	def __reversed__(self):
+		return self.reversed()
+
+	def empty(self):
+		'''
+			True if no final state can be reached from the initial state. This
+			is a graph search: no DFA is needed.
+		'''
+		reachable = {self.initial}
+		stack = [self.initial]
+		while len(stack) > 0:
+			state = stack.pop()
+			if state in self.finals:
+				return False
+			nexts = set(self.epsilons.get(state, ()))
+			for symbol in self.map.get(state, {}):
+				nexts.update(self.map[state][symbol])
+			for next in nexts:
+				if next not in reachable:
+					reachable.add(next)
+					stack.append(next)
+		return True
+
+	# These all need a DFA
+
+	def everythingbut(self):
+		return self.to_fsm().everythingbut()
+
+	def intersection(*nfas):
+		return fsm.intersection(*nfas)
+
+	def __and__(self, other):
+		return self.intersection(other)
+
+	def difference(*nfas):
+		return fsm.difference(*nfas)
+
+	def __sub__(self, other):
+		return self.difference(other)
+
+	def symmetric_difference(*nfas):
+		return fsm.symmetric_difference(*nfas)
+
+	def __xor__(self, other):
+		return self.symmetric_difference(other)
+
+	def equivalent(self, other):
+		return (self ^ other).empty()
+
+def _disjoint(nfas):
+	'''
+		Renumber the states of several NFAs to consecutive integers, so that
+		they don't clash. Return the combined alphabet, states, map and
+		epsilons, plus a dict per NFA from old to new state numbers.
+	'''
+	alphabet = set().union(*[n.alphabet for n in nfas])
+	renumbered = []
+	for n in nfas:
+		offset = sum(len(r) for r in renumbered)
+		renumbered.append(dict(
+			(state, offset + i)
+			for (i, state) in enumerate(n.states)
+		))
+	states = set(range(sum(len(r) for r in renumbered)))
+	map = {}
+	epsilons = {}
+	for (n, numbers) in zip(nfas, renumbered):
+		for state in n.map:
+			map[numbers[state]] = dict(
+				(symbol, set(numbers[next] for next in n.map[state][symbol]))
+				for symbol in n.map[state]
+			)
+		for state in n.epsilons:
+			epsilons[numbers[state]] = set(numbers[next] for next in n.epsilons[state])
+	return (alphabet, states, map, epsilons, renumbered)
+
+def _deterministic(fsms):
+	'''Determinise any NFAs among `fsms`, so that FSMs and NFAs can be mixed.'''
+	return [f.to_fsm() if hasattr(f, "epsilons") else f for f in fsms]
+
+def nfa_null(alphabet):
+	'''An NFA accepting nothing, not even the empty string.'''
+	return nfa(alphabet = alphabet, states = {0}, initial = 0, finals = set(), map = {})
+
+def nfa_epsilon(alphabet):
+	'''An NFA accepting only the empty string.'''
+	return nfa(alphabet = alphabet, states = {0}, initial = 0, finals = {0}, map = {})
+
 def null(alphabet):
 	'''
 		An FSM accepting nothing (not even the empty string). This is
@@ -667,12 +1018,95 @@ def epsilon(alphabet):
 		map      = {},
 	)
 
+def from_words(words):
+	'''
+		Return the minimal FSM accepting exactly the supplied words (iterables of
+		symbols, e.g. strings), which must be supplied in sorted order. This is
+		the incremental algorithm of Daciuk, Mihov, Watson and Watson (2000): the
+		machine is kept minimal as the words stream in, apart from the path
+		spelling out the most recent word, so memory use is proportional to the
+		size of the minimal machine rather than to the size of the input.
+	'''
+	alphabet = set()
+	finals = set()
+	map = {0: {}}
+
+	# Every state which is known not to be equivalent to any other state is
+	# listed here, keyed by its "signature": finality plus outgoing transitions.
+	register = {}
+
+	# States spelling out the previous word, from the initial state onwards.
+	# Apart from the initial state, none of these have been registered yet.
+	path = [0]
+	previous = None
+	counter = itertools.count(1)
+
+	def signature(state):
+		return (
+			state in finals,
+			tuple(sorted(map[state].items(), key=lambda item: key(item[0]))),
+		)
+
+	def minimise(depth):
+		'''
+			Register (or merge with an existing equivalent state) every state on
+			the path beyond `depth`, working backwards from the deepest.
+		'''
+		for i in reversed(range(depth + 1, len(path))):
+			state = path[i]
+			sig = signature(state)
+			if sig in register:
+				map[path[i - 1]][previous[i - 1]] = register[sig]
+				del map[state]
+				finals.discard(state)
+			else:
+				register[sig] = state
+		del path[depth + 1:]
+
+	for word in words:
+		word = list(word)
+		if previous is not None and word <= previous:
+			if word == previous:
+				continue
+			raise Exception("Words must be supplied in sorted order: " + repr(word) + " follows " + repr(previous))
+
+		# Length of the prefix shared with the previous word
+		common = 0
+		if previous is not None:
+			while common < len(word) and common < len(previous) \
+			and word[common] == previous[common]:
+				common += 1
+
+		# The rest of the previous word's path can never change again.
+		minimise(common)
+
+		for symbol in word[common:]:
+			alphabet.add(symbol)
+			state = next(counter)
+			map[path[-1]][symbol] = state
+			map[state] = {}
+			path.append(state)
+		finals.add(path[-1])
+		previous = word
+
+	if previous is not None:
+		minimise(0)
+
+	return fsm(
+		alphabet = alphabet,
+		states   = set(map),
+		initial  = 0,
+		finals   = finals,
+		map      = map,
+	)
+
 def parallel(fsms, test):
 	'''
 		Crawl several FSMs in parallel, mapping the states of a larger meta-FSM.
 		To determine whether a state in the larger FSM is final, pass all of the
 		finality statuses (e.g. [True, False, False] to `test`.
 	'''
+	fsms = _deterministic(fsms)
 	alphabet = set().union(*[fsm.alphabet for fsm in fsms])
 
 	initial = dict([(i, fsm.initial) for (i, fsm) in enumerate(fsms)])
@@ -710,6 +1144,14 @@ def crawl(alphabet, initial, final, follow):
 	finals = set()
 	map = {}
 
+	# Look states up by hash where possible. Some callers, like parallel(),
+	# use dicts as states, which can't be hashed: those need a linear search.
+	index = {}
+	try:
+		index[initial] = 0
+	except TypeError:
+		index = None
+
 	# iterate over a growing list
 	i = 0
 	while i < len(states):
@@ -725,11 +1167,16 @@ def crawl(alphabet, initial, final, follow):
 			try:
 				next = follow(state, symbol)
 
-				try:
-					j = states.index(next)
-				except ValueError:
-					j = len(states)
-					states.append(next)
+				if index is not None:
+					j = index.setdefault(next, len(states))
+					if j == len(states):
+						states.append(next)
+				else:
+					try:
+						j = states.index(next)
+					except ValueError:
+						j = len(states)
+						states.append(next)
 
 			except OblivionError:
 				# Reached an oblivion state. Don't list it.
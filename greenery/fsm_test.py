@@ -4,7 +4,7 @@ if __name__ == "__main__":
 	raise Exception("Test files can't be run directly. Use `python -m pytest greenery`")
 
 import pytest
-from greenery.fsm import fsm, null, epsilon, anything_else
+from greenery.fsm import fsm, null, epsilon, anything_else, from_words, nfa, nfa_null, nfa_epsilon
 
 def test_addbug():
 	# Odd bug with fsm.__add__(), exposed by "[bc]*c"
@@ -236,6 +236,25 @@ def test_star_advanced():
 	assert not starred.accepts("aabb")
 	assert starred.accepts("abababa")
 
+def test_star_nonfinal_initial():
+	# This is (a|ab)*. Transitions out of the final state reached by "a" must
+	# not be available before anything has been read.
+	starred = fsm(
+		alphabet = {"a", "b"},
+		states   = {0, 1, 2},
+		initial  = 0,
+		finals   = {1, 2},
+		map      = {
+			0 : {"a" : 1},
+			1 : {"b" : 2},
+			2 : {},
+		}
+	).star()
+	assert starred.accepts("")
+	assert starred.accepts("aab")
+	assert not starred.accepts("b")
+	assert not starred.accepts("abb")
+
 def test_reduce():
 	# FSM accepts no strings but has 3 states, needs only 1
 	asdf = fsm(
@@ -636,3 +655,89 @@ def test_oblivion_crawl(a):
 	assert len((abc & abc).states) == 4
 	assert len((abc ^ abc).states) == 1
 	assert len((abc - abc).states) == 1
+
+def test_from_words():
+	words = ["", "cat", "cats", "dog", "dogs", "do", "fog", "fogs"]
+	f = from_words(sorted(words))
+	for word in words:
+		assert f.accepts(word)
+	assert not f.accepts("ca")
+	assert not f.accepts("catss")
+	assert len(f) == len(words)
+	# The machine is already minimal: the "s" suffixes are shared
+	assert len(f.states) == len(f.reduce().states)
+	assert len(f.states) == 9
+
+	# duplicates are fine; anything out of order is not
+	assert from_words(["a", "a", "b"]).accepts("b")
+	with pytest.raises(Exception):
+		from_words(["b", "a"])
+
+	assert from_words([]).empty()
+	assert from_words([[1, 2], [1, 3]]).accepts([1, 3])
+
+def test_from_words_large():
+	words = sorted(set(format(i * 7919 % 100000, "05") for i in range(20000)))
+	f = from_words(words)
+	assert len(f) == len(words)
+	assert all(f.accepts(word) for word in words[::97])
+	assert not f.accepts("1234")
+
+def test_nfa():
+	# "a|ab", nondeterministically
+	aab = nfa(
+		alphabet = {"a", "b"},
+		states   = {0, 1, 2, 3},
+		initial  = 0,
+		finals   = {1, 3},
+		map      = {
+			0: {"a": {1, 2}},
+			2: {"b": {3}},
+		},
+	)
+	assert aab.accepts("a")
+	assert aab.accepts("ab")
+	assert not aab.accepts("b")
+	assert not aab.accepts("abb")
+
+	# FSMs mix with NFAs
+	cs = fsm(
+		alphabet = {"c"},
+		states   = {0},
+		initial  = 0,
+		finals   = {0},
+		map      = {0: {"c": 0}},
+	)
+	both = (aab + cs).star()
+	assert both.accepts("")
+	assert both.accepts("abcca")
+	assert not both.accepts("c")
+	assert (aab | cs).accepts("cc")
+	assert (aab * 2).accepts("aba")
+	assert not (aab * 2).accepts("ab")
+	assert aab.reversed().accepts("ba")
+	assert not aab.reversed().accepts("ab")
+
+	# Subset construction only when asked for
+	dfa = both.to_fsm()
+	assert dfa.accepts("abcca")
+	assert not dfa.accepts("c")
+	assert len(dfa.reduce().states) == 3
+	assert not aab.everythingbut().accepts("ab")
+	assert (aab & cs.to_nfa()).empty()
+	assert (aab - nfa_epsilon({"a"})).equivalent(aab)
+	assert nfa_null({"a"}).empty()
+	assert not nfa_epsilon({"a"}).empty()
+
+def test_nfa_epsilons_not_shared():
+	# Each NFA gets its own epsilons, even when it is given none
+	a = nfa(alphabet={"a"}, states={0, 1}, initial=0, finals={1}, map={0: {"a": {1}}})
+	b = nfa(alphabet={"a"}, states={0}, initial=0, finals={0}, map={})
+	a.epsilons[1] = {0}
+	assert b.epsilons == {}
+	assert not b.accepts("a")
+
+	epsilons = {0: {1}}
+	c = nfa(alphabet={"a"}, states={0, 1}, initial=0, finals={1}, map={}, epsilons=epsilons)
+	epsilons[1] = {0}
+	assert c.epsilons == {0: {1}}
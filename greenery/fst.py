@@ -0,0 +1,395 @@
+# -*- coding: utf-8 -*-
+
+'''
+	Finite state transducers, for rewriting strings in a single pass.
+
+	A transducer is an FSM whose transitions also write output. Each
+	transition reads one input symbol and writes a (possibly empty) tuple of
+	output characters; a final state writes a last tuple when the input ends.
+	In an output, `fsm.anything_else` stands for the character which the
+	transition read, so that a transducer can copy characters outside its
+	alphabet.
+
+	`rewrite()` builds a deterministic transducer which applies a whole list of
+	(pattern, replacement) rules at once, so that N substitutions cost one pass
+	over the input instead of N. Transducers can also be composed, so that the
+	output of one is fed to another, and nondeterministic ones can be made
+	deterministic (Mohri's algorithm) when that is possible at all.
+'''
+
+from greenery import fsm, lexer
+
+class fst:
+	'''
+		`alphabet` is the set of input symbols, `finals` maps each final state to
+		the set of outputs it may write at the end of the input, and `map` maps
+		each state and symbol to a set of (next state, output) pairs. Outputs are
+		given as strings or tuples of characters, and stored as tuples. Omitted
+		transitions lead to a dead state, as with `fsm`.
+	'''
+	def __setattr__(self, name, value):
+		'''Immutability prevents some potential problems.'''
+		raise Exception("This object is immutable.")
+
+	def __init__(self, alphabet, states, initial, finals, map):
+		if not initial in states:
+			raise Exception("Initial state " + repr(initial) + " must be one of " + repr(states))
+		deterministic = True
+		newfinals = {}
+		for state in finals:
+			if not state in states:
+				raise Exception("Final state " + repr(state) + " must be one of " + repr(states))
+			newfinals[state] = frozenset(_output(output) for output in finals[state])
+			for output in newfinals[state]:
+				if fsm.anything_else in output:
+					raise Exception("A final output can't copy an input character: " + repr(output))
+			if len(newfinals[state]) != 1:
+				deterministic = False
+		newmap = {}
+		for state in map:
+			newmap[state] = {}
+			for symbol in map[state]:
+				transitions = frozenset((next, _output(output)) for (next, output) in map[state][symbol])
+				for (next, output) in transitions:
+					if not next in states:
+						raise Exception("Transition for state " + repr(state) + " and symbol " + repr(symbol) + " leads to " + repr(next) + ", which is not a state")
+				if len(transitions) != 1:
+					deterministic = False
+				newmap[state][symbol] = transitions
+
+		self.__dict__["alphabet"] = set(alphabet)
+		self.__dict__["states"] = set(states)
+		self.__dict__["initial"] = initial
+		self.__dict__["finals"] = newfinals
+		self.__dict__["map"] = newmap
+		self.__dict__["deterministic"] = deterministic
+
+		# For `transduce()`, each deterministic transition as (next state,
+		# output string). Characters outside the alphabet are added as they
+		# are met, with any copies of them substituted in
+		if deterministic:
+			table = {}
+			for state in newmap:
+				table[state] = {}
+				for (symbol, transitions) in newmap[state].items():
+					if symbol is fsm.anything_else:
+						continue
+					for (next, output) in transitions:
+						table[state][symbol] = (next, "".join(_substitute(output, symbol)))
+			self.__dict__["_table"] = table
+
+	def _symbol(self, char):
+		if char not in self.alphabet and fsm.anything_else in self.alphabet:
+			return fsm.anything_else
+		return char
+
+	def transduce(self, input):
+		'''
+			Return the output for the input string, or None if it is rejected.
+			Only a deterministic transducer can do this, in a single pass.
+		'''
+		if not self.deterministic:
+			raise Exception("Only a deterministic transducer can transduce; try determinise()")
+		table = self._table
+		state = self.initial
+		parts = []
+		for char in input:
+			row = table.get(state)
+			if row is None:
+				return None
+			transition = row.get(char)
+			if transition is None:
+				if char in self.alphabet or fsm.anything_else not in self.map[state]:
+					return None
+				for (next, output) in self.map[state][fsm.anything_else]:
+					transition = row[char] = (next, "".join(_substitute(output, char)))
+			(state, text) = transition
+			parts.append(text)
+		if state not in self.finals:
+			return None
+		for output in self.finals[state]:
+			parts.extend(output)
+		return "".join(parts)
+
+	def outputs(self, input):
+		'''
+			Return the set of every output the transducer may write for the
+			input string, deterministic or not.
+		'''
+		current = {(self.initial, ())}
+		for char in input:
+			symbol = self._symbol(char)
+			next = set()
+			for (state, written) in current:
+				for (after, output) in self.map.get(state, {}).get(symbol, ()):
+					next.add((after, written + _substitute(output, char)))
+			current = next
+		return set(
+			"".join(written + output)
+			for (state, written) in current
+			if state in self.finals
+			for output in self.finals[state]
+		)
+
+	def _widen(self, symbols):
+		'''
+			Return a transducer whose alphabet also has `symbols`, which it
+			treats exactly as it did when they were `anything_else`.
+		'''
+		new = set(symbols) - self.alphabet - {fsm.anything_else}
+		if len(new) == 0 or fsm.anything_else not in self.alphabet:
+			return self
+		map = {}
+		for state in self.map:
+			map[state] = dict(self.map[state])
+			if fsm.anything_else in self.map[state]:
+				for symbol in new:
+					map[state][symbol] = set(
+						(next, _substitute(output, symbol))
+						for (next, output) in self.map[state][fsm.anything_else]
+					)
+		return fst(
+			alphabet = self.alphabet | new,
+			states   = self.states,
+			initial  = self.initial,
+			finals   = self.finals,
+			map      = map,
+		)
+
+	def _run(self, state, output):
+		'''
+			Feed a sequence of characters to this transducer from `state`,
+			returning the set of (state, output) pairs it may reach.
+			`anything_else` in the sequence is some character outside the
+			alphabet, which an `anything_else` in the output copies.
+		'''
+		current = {(state, ())}
+		for char in output:
+			symbol = self._symbol(char)
+			next = set()
+			for (state, written) in current:
+				for (after, more) in self.map.get(state, {}).get(symbol, ()):
+					next.add((after, written + _substitute(more, char)))
+			current = next
+		return current
+
+	def compose(self, other):
+		'''
+			Return a transducer which writes whatever `other` writes when fed
+			the output of `self`.
+		'''
+		first = self._widen(other.alphabet)
+		initial = (first.initial, other.initial)
+		states = [initial]
+		index = {initial: 0}
+		map = {}
+		finals = {}
+		i = 0
+		while i < len(states):
+			(p, q) = states[i]
+			if p in first.finals:
+				outputs = set()
+				for output in first.finals[p]:
+					for (r, written) in other._run(q, output):
+						for last in other.finals.get(r, ()):
+							outputs.add(written + last)
+				if len(outputs) > 0:
+					finals[i] = outputs
+			map[i] = {}
+			for symbol in first.map.get(p, {}):
+				transitions = set()
+				for (after, output) in first.map[p][symbol]:
+					if symbol is not fsm.anything_else:
+						output = _substitute(output, symbol)
+					for (r, written) in other._run(q, output):
+						next = index.setdefault((after, r), len(states))
+						if next == len(states):
+							states.append((after, r))
+						transitions.add((next, written))
+				if len(transitions) > 0:
+					map[i][symbol] = transitions
+			i += 1
+		return fst(
+			alphabet = first.alphabet,
+			states   = set(range(len(states))),
+			initial  = 0,
+			finals   = finals,
+			map      = map,
+		)
+
+	def determinise(self, limit=10000):
+		'''
+			Return an equivalent deterministic transducer, using Mohri's
+			algorithm. Each new state is a set of (state, delayed output) pairs:
+			a transition writes only the longest output which every alternative
+			agrees on, and delays the rest. This fails if the transducer can
+			write two different outputs for one input, and fails to terminate
+			(here, exceeds `limit` states) if the delayed outputs can grow
+			without bound, in which case no deterministic transducer exists.
+		'''
+		initial = frozenset([(self.initial, ())])
+		states = [initial]
+		index = {initial: 0}
+		map = {}
+		finals = {}
+		i = 0
+		while i < len(states):
+			if len(states) > limit:
+				raise Exception("This transducer can't be determinised in " + repr(limit) + " states")
+			current = states[i]
+			outputs = set(
+				delayed + output
+				for (state, delayed) in current
+				for output in self.finals.get(state, ())
+			)
+			if len(outputs) > 1:
+				raise Exception("This transducer has several outputs for one input, so it can't be determinised")
+			if len(outputs) == 1:
+				finals[i] = outputs
+			map[i] = {}
+			for symbol in self.alphabet:
+				pairs = set(
+					(after, delayed + output)
+					for (state, delayed) in current
+					for (after, output) in self.map.get(state, {}).get(symbol, ())
+				)
+				if len(pairs) == 0:
+					continue
+				common = _prefix([output for (after, output) in pairs])
+				next = frozenset((after, output[len(common):]) for (after, output) in pairs)
+				for (after, delayed) in next:
+					# An `anything_else` can only be written by the transition
+					# which read that character
+					if fsm.anything_else in delayed:
+						raise Exception("This transducer can't be determinised, since it would have to remember a character outside its alphabet")
+				j = index.setdefault(next, len(states))
+				if j == len(states):
+					states.append(next)
+				map[i][symbol] = {(j, common)}
+			i += 1
+		return fst(
+			alphabet = self.alphabet,
+			states   = set(range(len(states))),
+			initial  = 0,
+			finals   = finals,
+			map      = map,
+		)
+
+def rewrite(rules, limit=10000):
+	'''
+		Build a deterministic transducer which applies every (pattern,
+		replacement) rule in one left-to-right pass, where each pattern is a
+		lego piece or a regular expression string, and each replacement a
+		string. As with `lexer`, at each position the longest non-empty match
+		of any pattern is replaced (the first rule winning a tie), and where
+		nothing matches, one character is copied.
+
+		The transducer only writes a replacement once it is sure that no
+		longer match is coming, so it must remember the characters read since
+		the last point where a match ended. If there can be arbitrarily many,
+		as with the rule ("a+b", "x") on the input "aaaa...", no finite
+		transducer can do the job, and an exception is raised. So it is if
+		more than `limit` states are needed.
+	'''
+	lex = lexer.lexer([(i, pattern) for (i, (pattern, replacement)) in enumerate(rules)])
+	dfa = lex.dfa
+	accepting = lex.accepting
+	replacements = [_output(replacement) for (pattern, replacement) in rules]
+
+	# A state is (DFA state, replacement for the longest match so far or None,
+	# characters read since that match ended)
+	start = (dfa.initial, None, ())
+
+	def feed(state, symbol):
+		'''Feed one symbol in; return the new state and what must be written.'''
+		written = []
+		pending = [symbol]
+		while len(pending) > 0:
+			char = pending.pop(0)
+			(d, emit, rest) = state
+			after = dfa.map.get(d, {}).get(char)
+			if after is not None:
+				if after in accepting:
+					state = (after, replacements[accepting[after]], ())
+				else:
+					state = (after, emit, rest + (char,))
+				continue
+			# No match can be extended: finish the current one and read the
+			# characters after it again, or copy one character if there's none
+			if emit is not None:
+				written.extend(emit)
+				pending = list(rest) + [char] + pending
+			elif len(rest) > 0:
+				written.append(rest[0])
+				pending = list(rest[1:]) + [char] + pending
+			else:
+				written.append(char)
+			state = start
+		if fsm.anything_else in state[2]:
+			raise Exception("Can't rewrite with a finite transducer, since it would have to remember a character outside its alphabet")
+		# Past this many characters, the DFA has gone round a loop since the
+		# last match ended, and could go round it any number of times
+		if len(state[2]) > len(dfa.states):
+			raise Exception("Can't rewrite with a finite transducer, since it would have to remember arbitrarily many characters")
+		return (state, tuple(written))
+
+	def flush(state):
+		'''What must be written when the input ends in `state`.'''
+		written = []
+		while state[1] is not None or len(state[2]) > 0:
+			(d, emit, rest) = state
+			if emit is not None:
+				written.extend(emit)
+			else:
+				written.append(rest[0])
+				rest = rest[1:]
+			state = start
+			for char in rest:
+				(state, more) = feed(state, char)
+				written.extend(more)
+		return tuple(written)
+
+	states = [start]
+	index = {start: 0}
+	map = {}
+	i = 0
+	while i < len(states):
+		if len(states) > limit:
+			raise Exception("These rules can't be applied by a transducer of " + repr(limit) + " states")
+		map[i] = {}
+		for symbol in dfa.alphabet:
+			(next, written) = feed(states[i], symbol)
+			j = index.setdefault(next, len(states))
+			if j == len(states):
+				states.append(next)
+			map[i][symbol] = {(j, written)}
+		i += 1
+
+	return fst(
+		alphabet = dfa.alphabet,
+		states   = set(range(len(states))),
+		initial  = 0,
+		finals   = dict((i, {flush(state)}) for (i, state) in enumerate(states)),
+		map      = map,
+	)
+
+def _output(output):
+	'''Turn a string or sequence of strings into a tuple of characters.'''
+	if isinstance(output, str):
+		return tuple(output)
+	chars = ()
+	for item in output:
+		chars += (item,) if item is fsm.anything_else else tuple(item)
+	return chars
+
+def _substitute(output, char):
+	'''Replace `anything_else` in an output by the character it copies.'''
+	return tuple(char if item is fsm.anything_else else item for item in output)
+
+def _prefix(outputs):
+	'''The longest common prefix of some tuples.'''
+	shortest = min(outputs, key=len)
+	for (i, item) in enumerate(shortest):
+		if any(output[i] != item for output in outputs):
+			return shortest[:i]
+	return shortest
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+	raise Exception("Test files can't be run directly. Use `python -m pytest greenery`")
+
+import random
+import re
+from greenery.fsm import anything_else
+from greenery.fst import fst, rewrite
+
+rules = [("colou?r", "COLOR"), ("ab", "X"), ("abc", "Y"), ("b+", "B"), ("[0-9]+", "#")]
+
+def _rewrite(string):
+	'''Apply `rules` the slow way, by trying every rule at every position.'''
+	output = []
+	i = 0
+	while i < len(string):
+		best = None
+		for (pattern, replacement) in rules:
+			for j in range(len(string), i, -1):
+				if re.match("(" + pattern + ")$", string[i:j]):
+					if best is None or j > best[0]:
+						best = (j, replacement)
+					break
+		if best is None:
+			output.append(string[i])
+			i += 1
+		else:
+			output.append(best[1])
+			i = best[0]
+	return "".join(output)
+
+def test_rewrite():
+	t = rewrite(rules)
+	assert t.deterministic
+	assert t.transduce("the colour ab abcd abbb 123é colo") == "the COLOR X Yd XB #é colo"
+	random.seed(0)
+	for n in range(500):
+		string = "".join(random.choice("abcolur1 é") for i in range(random.randint(0, 12)))
+		assert t.transduce(string) == _rewrite(string)
+
+def test_rewrite_impossible():
+	try:
+		rewrite([("a+b", "x")])
+		assert False
+	except Exception as e:
+		assert str(e) == "Can't rewrite with a finite transducer, since it would have to remember arbitrarily many characters"
+
+def test_compose():
+	t = rewrite([("a", "b")]).compose(rewrite([("b", "c"), ("z", "y")]))
+	assert t.deterministic
+	assert t.transduce("abzé") == "ccyé"
+
+def test_determinise():
+	# Nondeterministically, either "ab" -> "x" or "ac" -> "y"; the choice is
+	# only known at the second character
+	t = fst(
+		alphabet = {"a", "b", "c"},
+		states   = {0, 1, 2, 3},
+		initial  = 0,
+		finals   = {3: {""}},
+		map      = {
+			0: {"a": {(1, "x"), (2, "y")}},
+			1: {"b": {(3, "")}},
+			2: {"c": {(3, "")}},
+		},
+	)
+	assert not t.deterministic
+	assert t.outputs("ab") == {"x"}
+	d = t.determinise()
+	assert d.deterministic
+	assert d.transduce("ab") == "x"
+	assert d.transduce("ac") == "y"
+	assert d.transduce("aa") is None
+
+	# Two outputs for "a": no deterministic equivalent
+	ambiguous = fst(
+		alphabet = {"a"},
+		states   = {0, 1},
+		initial  = 0,
+		finals   = {1: {""}},
+		map      = {0: {"a": {(1, "x"), (1, "y")}}},
+	)
+	assert ambiguous.outputs("a") == {"x", "y"}
+	try:
+		ambiguous.determinise()
+		assert False
+	except Exception:
+		pass
+
+def test_copy():
+	# Copy anything, but double "a"s
+	t = fst(
+		alphabet = {"a", anything_else},
+		states   = {0},
+		initial  = 0,
+		finals   = {0: {""}},
+		map      = {0: {"a": {(0, "aa")}, anything_else: {(0, (anything_else,))}}},
+	)
+	assert t.transduce("banana") == "baanaanaa"
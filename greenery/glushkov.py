@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+
+'''
+	Glushkov position automata.
+
+	Every charclass occurring in a lego piece is a "position". The Glushkov
+	automaton has one state per position plus an initial state, 0, and no
+	epsilon transitions: entering a state means reading a character matched by
+	that state's charclass. All that is needed to build it are the sets of
+	positions which can come first and last in a match, and the set of
+	positions which can follow each position. These are computed in a single
+	walk over the lego tree, so the cost is proportional to the length of the
+	regular expression rather than to the size of its DFA.
+
+	Bounded multipliers are unrolled, e.g. "x{2,4}" is treated as
+	"xx(x(x)?)?", with fresh positions for each copy of "x".
+
+	The NFA can be determinised, or simulated directly, either one set of
+	positions at a time or bit-parallelly (see `bitparallel`).
+'''
+
+from greenery import fsm
+
+class glushkov:
+	'''
+		A Glushkov NFA. `labels[q]` is the charclass of position q (`labels[0]`
+		is None), `follow[q]` is the set of positions which may be entered after
+		q (`follow[0]` being the set of first positions) and `finals` is the set
+		of positions, possibly including 0, where a match may end.
+	'''
+	def __setattr__(self, name, value):
+		'''Immutability prevents some potential problems.'''
+		raise Exception("This object is immutable.")
+
+	def __init__(self, labels, follow, finals):
+		if len(labels) != len(follow) or labels[0] is not None:
+			raise Exception("Position 0 must be the unlabelled initial state")
+		self.__dict__["labels"] = tuple(labels)
+		self.__dict__["follow"] = tuple(frozenset(f) for f in follow)
+		self.__dict__["finals"] = frozenset(finals)
+
+	def step(self, current, symbol):
+		'''
+			Return the set of positions reachable from the set `current` by
+			reading `symbol`, which may be `fsm.anything_else`.
+		'''
+		labels = self.labels
+		if symbol is fsm.anything_else:
+			return frozenset(
+				q
+				for p in current
+				for q in self.follow[p]
+				if labels[q].negated
+			)
+		return frozenset(
+			q
+			for p in current
+			for q in self.follow[p]
+			if symbol in labels[q]
+		)
+
+	def accepts(self, input):
+		'''
+			Simulate the NFA directly, without building a DFA.
+		'''
+		current = frozenset([0])
+		for symbol in input:
+			current = self.step(current, symbol)
+			if len(current) == 0:
+				return False
+		return not current.isdisjoint(self.finals)
+
+	def __contains__(self, string):
+		return self.accepts(string)
+
+	def to_fsm(self, alphabet=None):
+		'''
+			Determinise by subset construction. The result is not minimised:
+			call reduce() on it if need be.
+		'''
+		if alphabet is None:
+			alphabet = {fsm.anything_else}
+			for label in self.labels[1:]:
+				alphabet |= label.alphabet()
+
+		# Which symbols of the alphabet each position matches
+		matched = [()] + [
+			[
+				symbol
+				for symbol in alphabet
+				if (label.negated if symbol is fsm.anything_else else symbol in label)
+			]
+			for label in self.labels[1:]
+		]
+
+		# crawl() asks for every symbol of a state in turn, so work out the
+		# whole row of transitions at once, from the positions rather than
+		# from the symbols
+		cached = [None, {}]
+
+		def final(state):
+			return not state.isdisjoint(self.finals)
+
+		def follow(state, symbol):
+			(previous, row) = cached
+			if previous is not state:
+				row = {}
+				for q in set().union(*(self.follow[p] for p in state)):
+					for s in matched[q]:
+						row.setdefault(s, set()).add(q)
+				cached[:] = [state, row]
+			if symbol not in row:
+				raise fsm.OblivionError
+			return frozenset(row[symbol])
+
+		return fsm.crawl(alphabet, frozenset([0]), final, follow)
+
+def from_lego(piece):
+	'''
+		Compute first, last and follow sets over a lego piece and return the
+		resulting Glushkov NFA.
+	'''
+	labels = [None]
+	follow = [set()]
+	(nullable, first, last) = _positions(piece, labels, follow)
+	follow[0] = first
+	finals = set(last)
+	if nullable:
+		finals.add(0)
+	return glushkov(labels, follow, finals)
+
+def _positions(piece, labels, follow, bounds=None):
+	'''
+		Number the positions of `piece`, appending to `labels` and `follow`, and
+		return (nullable, first, last) for it.
+		If a `bounds` dict is supplied, a charclass repeated more than once, like
+		"[^,]{1,255}", is not unrolled: it becomes a single position, which
+		`bounds` maps to the (min, max) of its multiplier (see `counting`).
+	'''
+	if hasattr(piece, "ranges"):
+		if piece.empty():
+			return (False, set(), set())
+		p = len(labels)
+		labels.append(piece)
+		follow.append(set())
+		return (False, {p}, {p})
+
+	if hasattr(piece, "multiplicand"):
+		if bounds is not None \
+		and hasattr(piece.multiplicand, "ranges") \
+		and (piece.multiplier.max.v is None or piece.multiplier.max.v > 1):
+			(nullable, first, last) = _positions(piece.multiplicand, labels, follow)
+			for p in first:
+				bounds[p] = (piece.multiplier.min.v, piece.multiplier.max.v)
+			return (nullable or piece.multiplier.min.v == 0, first, last)
+
+		mandatory = [
+			_positions(piece.multiplicand, labels, follow, bounds)
+			for i in range(piece.multiplier.mandatory.v)
+		]
+		if piece.multiplier.optional.v is None:
+			optional = _star(_positions(piece.multiplicand, labels, follow, bounds), follow)
+		else:
+			optional = [
+				_positions(piece.multiplicand, labels, follow, bounds)
+				for i in range(piece.multiplier.optional.v)
+			]
+			# Nest the optional copies, "(x(x)?)?" rather than "x?x?", so that
+			# every string is matched along only one path
+			result = (True, set(), set())
+			for unit in reversed(optional):
+				result = _optional(_concatenate(unit, result, follow))
+			optional = result
+		result = (True, set(), set())
+		for unit in mandatory:
+			result = _concatenate(result, unit, follow)
+		return _concatenate(result, optional, follow)
+
+	if hasattr(piece, "mults"):
+		result = (True, set(), set())
+		for m in piece.mults:
+			result = _concatenate(result, _positions(m, labels, follow, bounds), follow)
+		return result
+
+	if hasattr(piece, "concs"):
+		result = (False, set(), set())
+		for c in piece.concs:
+			(nullable, first, last) = _positions(c, labels, follow, bounds)
+			result = (result[0] or nullable, result[1] | first, result[2] | last)
+		return result
+
+	raise Exception("Can't compute positions for " + repr(piece))
+
+def _concatenate(a, b, follow):
+	(nullable1, first1, last1) = a
+	(nullable2, first2, last2) = b
+	for p in last1:
+		follow[p] |= first2
+	return (
+		nullable1 and nullable2,
+		first1 | first2 if nullable1 else first1,
+		last1 | last2 if nullable2 else last2,
+	)
+
+def _optional(a):
+	(nullable, first, last) = a
+	return (True, first, last)
+
+def _star(a, follow):
+	(nullable, first, last) = a
+	for p in last:
+		follow[p] |= first
+	return (True, first, last)
+
+class bitparallel:
+	'''
+		Simulate a Glushkov NFA bit-parallelly. The set of active positions is a
+		Python int, with bit q set if position q is active. Each input character
+		costs one lookup of the positions whose charclass matches it, plus one
+		table lookup per 8 positions to find everything which can follow the
+		active positions: `table[k][byte]` is the union of the follow sets of
+		positions 8k to 8k + 7 selected by the bits of `byte`. There is no
+		determinisation and so no state explosion, and the cost per character
+		depends only on the number of positions.
+	'''
+	def __setattr__(self, name, value):
+		'''Immutability prevents some potential problems.'''
+		raise Exception("This object is immutable.")
+
+	def __init__(self, automaton):
+		if not hasattr(automaton, "follow"):
+			automaton = from_lego(automaton)
+
+		follow = [0] * len(automaton.labels)
+		for (p, positions) in enumerate(automaton.follow):
+			for q in positions:
+				follow[p] |= 1 << q
+
+		table = []
+		for k in range(0, len(follow), 8):
+			chunk = follow[k:k + 8]
+			row = [0] * 256
+			for byte in range(1, 256):
+				# Build each entry from a smaller one by adding its lowest bit
+				lowest = (byte & -byte).bit_length() - 1
+				row[byte] = row[byte & (byte - 1)] | (chunk[lowest] if lowest < len(chunk) else 0)
+			table.append(row)
+
+		self.__dict__["automaton"] = automaton
+		self.__dict__["table"] = table
+		self.__dict__["finals"] = sum(1 << p for p in automaton.finals)
+		# Characters are looked up as they are met, so this fills up lazily
+		self.__dict__["masks"] = {}
+
+	def mask(self, char):
+		'''
+			Return the positions whose charclass matches `char`, as a bitmask.
+		'''
+		mask = self.masks.get(char)
+		if mask is None:
+			mask = 0
+			for (q, label) in enumerate(self.automaton.labels):
+				if q > 0 and char in label:
+					mask |= 1 << q
+			self.masks[char] = mask
+		return mask
+
+	def accepts(self, input):
+		table = self.table
+		masks = self.masks
+		active = 1
+		for char in input:
+			reachable = 0
+			k = 0
+			while active:
+				reachable |= table[k][active & 0xff]
+				active >>= 8
+				k += 1
+			mask = masks.get(char)
+			if mask is None:
+				mask = self.mask(char)
+			active = reachable & mask
+			if active == 0:
+				return False
+		return active & self.finals != 0
+
+	def __contains__(self, string):
+		return self.accepts(string)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+	raise Exception("Test files can't be run directly. Use `python -m pytest greenery`")
+
+from greenery.lego import parse, charclass
+from greenery.glushkov import from_lego, bitparallel
+from greenery import fsm
+
+def test_positions():
+	g = from_lego(parse("a(b|c)*d"))
+	assert g.labels[0] is None
+	assert g.labels[1] == charclass("a")
+	assert set(g.labels[2:4]) == {charclass("b"), charclass("c")}
+	assert g.labels[4] == charclass("d")
+	assert g.follow[0] == {1}
+	assert g.follow[1] == {2, 3, 4}
+	assert g.follow[4] == set()
+	assert g.finals == {4}
+	assert from_lego(parse("a*")).finals == {0, 1}
+
+	# Bounded multipliers are unrolled into fresh positions
+	assert len(from_lego(parse("(ab){2,4}")).labels) == 9
+
+def test_glushkov_accepts():
+	g = from_lego(parse("[^ab]*(a|bc?){1,3}"))
+	assert g.accepts("xa")
+	assert g.accepts("bcab")
+	assert "bbb" in g
+	assert not g.accepts("")
+	assert not g.accepts("aaaa")
+	assert not g.accepts("bcx")
+	assert not from_lego(parse("a[]")).accepts("a")
+
+def test_glushkov_to_fsm():
+	for string in [
+		"(a|ab)*",
+		"(b*ab)*",
+		"(ab|ac){2,3}",
+		"a{3,7}b*|c+d{2}",
+		"(a|b)*a(a|b){5}",
+		"[^ab]*(a|bc?){0,3}",
+	]:
+		piece = parse(string)
+		assert from_lego(piece).to_fsm().equivalent(piece.to_fsm())
+
+	dfa = from_lego(parse("[^a]b")).to_fsm()
+	assert dfa.alphabet == {"a", "b", fsm.anything_else}
+	assert dfa.accepts("bb")
+	assert dfa.accepts(["c", "b"])
+	assert not dfa.accepts("ab")
+
+def test_bitparallel():
+	# Few positions, but a DFA with over two billion states
+	m = bitparallel(parse("(a|b)*a(a|b){30}"))
+	assert len(m.automaton.labels) == 64
+	assert m.accepts("a" + "b" * 30)
+	assert m.accepts("bbbbabababababababababababababababa")
+	assert not m.accepts("b" * 31)
+	assert not m.accepts("a" * 30)
+	assert not m.accepts("")
+
+	piece = parse("[^ab]*(a|bc?){1,3}")
+	m = bitparallel(from_lego(piece))
+	dfa = piece.to_fsm()
+	for string in ["", "a", "xa", "bcab", "bbb", "aaaa", "bcx", "\U0001f600bc"]:
+		assert m.accepts(string) == dfa.accepts(string)
+	assert m.mask("x") == m.mask("\U0001f600")
+	assert "bb" in m
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+'''
+	A lazily-built, size-bounded DFA for matching.
+
+	Some regular expressions, like "(a|b)*a(a|b){30}", have DFAs with
+	exponentially many states, so `to_fsm()` never finishes. But any single
+	input only visits as many DFA states as it has symbols. `lazydfa` simulates
+	an `fsm.nfa`, remembering each DFA state (set of NFA states) and transition
+	as it is discovered, so that inputs which keep revisiting the same states
+	run at DFA speed. When the number of cached states reaches `limit`, the
+	cache is thrown away, all but the current state, and rebuilt on demand,
+	which caps memory use whatever the input.
+'''
+
+from greenery import fsm
+
+class lazydfa:
+	'''
+		`machine` may be an `fsm.nfa`, an `fsm.fsm` or a lego piece. `limit` is
+		the maximum number of DFA states to keep at once. The counters `hits`,
+		`misses` and `flushes` record how often a transition was found in the
+		cache, how often it had to be computed, and how often the cache was
+		emptied.
+	'''
+	def __init__(self, machine, limit=10000):
+		if limit < 2:
+			raise Exception("A lazy DFA needs room for at least 2 states, not " + repr(limit))
+		if hasattr(machine, "to_nfa"):
+			machine = machine.to_nfa()
+		self.nfa = machine
+		self.limit = limit
+		self.initial = machine.closure([machine.initial])
+		self.cache = {}
+		self.hits = 0
+		self.misses = 0
+		self.flushes = 0
+
+	def _state(self, metastate, current=None):
+		'''
+			Return the cached DFA state for a set of NFA states, creating it if
+			need be. A DFA state is a tuple: the set of NFA states, whether it is
+			final, and a dict of the transitions discovered so far. If the cache
+			has to be emptied, the `current` state is put back with a fresh,
+			empty row: its old row still leads to the discarded states, which
+			would otherwise stay in memory alongside the new ones.
+		'''
+		state = self.cache.get(metastate)
+		if state is None:
+			if len(self.cache) >= self.limit:
+				self.cache.clear()
+				self.flushes += 1
+				if current is not None:
+					self.cache[current[0]] = (current[0], current[1], {})
+			state = (metastate, not metastate.isdisjoint(self.nfa.finals), {})
+			self.cache[metastate] = state
+		return state
+
+	def accepts(self, input):
+		'''
+			Test whether the NFA accepts the supplied string, building only the
+			part of the DFA which the string needs.
+		'''
+		alphabet = self.nfa.alphabet
+		fallback = fsm.anything_else in alphabet
+		state = self._state(self.initial)
+		for symbol in input:
+			if fallback and symbol not in alphabet:
+				symbol = fsm.anything_else
+			next = state[2].get(symbol)
+			if next is None:
+				self.misses += 1
+				next = self._state(self.nfa.step(state[0], symbol), state)
+				# After a flush, `state` has been replaced by a fresh copy
+				state = self.cache[state[0]]
+				state[2][symbol] = next
+			else:
+				self.hits += 1
+			if len(next[0]) == 0:
+				return False
+			state = next
+		return state[1]
+
+	def __contains__(self, string):
+		return self.accepts(string)
+
+	def hitrate(self):
+		'''The proportion of transitions which were found in the cache.'''
+		total = self.hits + self.misses
+		return self.hits / float(total) if total > 0 else 0.0
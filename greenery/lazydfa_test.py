@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+	raise Exception("Test files can't be run directly. Use `python -m pytest greenery`")
+
+import pytest
+from greenery.lego import parse
+from greenery.lazydfa import lazydfa
+
+def test_lazydfa_exponential():
+	# The DFA for this has over two billion states
+	m = lazydfa(parse("(a|b)*a(a|b){30}"))
+	assert m.accepts("a" + "b" * 30)
+	assert m.accepts("bbbbabababababababababababababababa")
+	assert not m.accepts("b" * 31)
+	assert not m.accepts("a" * 30)
+	assert "c" not in m
+
+def test_lazydfa_cache():
+	m = lazydfa(parse("[^ab]*(a|bc?){1,3}"))
+	assert m.accepts("xxxxbca")
+	assert m.misses > 0
+	(hits, misses) = (m.hits, m.misses)
+	assert m.accepts("xxxxbca")
+	assert m.misses == misses
+	assert m.hits == hits + 7
+	assert m.hitrate() == m.hits / float(m.hits + m.misses)
+	assert m.flushes == 0
+
+def test_lazydfa_limit():
+	strings = ["ab" * 20 + "a" * i + "b" * (30 - i) for i in range(31)]
+	unlimited = lazydfa(parse("(a|b)*a(a|b){30}"))
+	limited = lazydfa(parse("(a|b)*a(a|b){30}"), limit=10)
+	for string in strings:
+		assert limited.accepts(string) == unlimited.accepts(string)
+		assert len(limited.cache) <= 10
+	assert limited.flushes > 0
+	assert unlimited.flushes == 0
+
+	with pytest.raises(Exception):
+		lazydfa(parse("a"), limit=1)
+
+def test_lazydfa_flush_keeps_current():
+	# Each flush keeps the state being left, with only the new transition in
+	# its row, so nothing refers to the discarded states any more
+	m = lazydfa(parse("abc"), limit=2)
+	assert m.accepts("abc")
+	assert m.flushes == 2
+	assert len(m.cache) == 2
+	assert sum(len(state[2]) for state in m.cache.values()) == 1
+	for state in m.cache.values():
+		for next in state[2].values():
+			assert m.cache[next[0]] is next
+	assert m.accepts("abc")
+	assert not m.accepts("ab")
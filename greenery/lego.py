@@ -32,20 +32,140 @@
 	pattern, these procedures can drastically simplify a regex structure for
 	readability. They're also pretty extensible.
 '''
+import bisect
+import sys
+import threading
+import weakref
+
 from greenery import fsm
 
 class nomatch(Exception):
 	'''Thrown when parsing fails. Almost always caught and almost never fatal'''
 	pass
 
-def reduce_after(method):
-	'''reduce() the result of this method call (unless you already reduced it).'''
-	def new_method(self, *args, **kwargs):
-		result = method(self, *args, **kwargs)
-		if result == self:
-			return result
-		return result.reduce()
-	return new_method
+# Hash-consing. Every lego piece, bound and multiplier is constructed by way of
+# `_intern()`, which consults this table first. Structurally equal objects are
+# therefore one and the same object, each hash is computed exactly once, and
+# equality is reduced to an identity check. Entries vanish along with the last
+# outside reference to the object.
+_interned = weakref.WeakValueDictionary()
+_internlock = threading.Lock()
+
+def _intern(cls, key, **attributes):
+	'''
+		Return the unique live instance of `cls` identified by `key`, creating
+		and populating it with `attributes` if there isn't one. `key` must be
+		hashable and must capture everything which distinguishes one instance
+		from another.
+	'''
+	key = (cls, key)
+	try:
+		return _interned[key]
+	except KeyError:
+		pass
+	self = object.__new__(cls)
+	self.__dict__.update(attributes)
+	self.__dict__["_hash"] = hash(key)
+
+	# Another thread may have interned an equal object in the meantime. If so,
+	# it wins, otherwise two equal objects would compare unequal.
+	with _internlock:
+		return _interned.setdefault(key, self)
+
+def _normalform(piece):
+	'''
+		Since lego pieces are interned and immutable, the outcome of reducing
+		one is memoised on the piece itself: a piece which is known to be in
+		normal form carries a `_normal` flag and any other piece remembers what
+		it reduced to in `_reduced`. Return that outcome, or None if the piece
+		hasn't been reduced yet.
+	'''
+	if "_normal" in piece.__dict__:
+		return piece
+	return piece.__dict__.get("_reduced")
+
+def _rewrite(piece):
+	'''
+		The engine behind every reduce() call. Each class of lego piece lists
+		its rewrite rules, in order of preference, in `_rules`; a rule returns a
+		replacement for the piece it was given, or None if it doesn't apply.
+		Pieces are processed bottom-up from a worklist: a piece is only examined
+		once all of its children are in normal form, and a piece produced by a
+		rule is pushed back onto the worklist, where any children it shares with
+		the original are already known to be reduced and are not visited again.
+		A piece to which no rule applies is in normal form. A rule must not
+		return a piece containing the one it was given, which could never be
+		reduced; that is detected and raises an exception.
+	'''
+	rewritten = {}
+	waiting = set()
+	worklist = [piece]
+	while len(worklist) > 0:
+		current = worklist[-1]
+		if _normalform(current) is not None:
+			worklist.pop()
+			continue
+
+		# `current` was already rewritten into something else. Once that
+		# something else is reduced, so is `current`.
+		if current in rewritten:
+			result = _normalform(rewritten[current])
+			if result is None:
+				# Reducing what `current` became led back to `current` itself
+				if current in waiting:
+					raise Exception("Rewriting " + repr(current) + " produced a piece containing it")
+				waiting.add(current)
+				worklist.append(rewritten[current])
+				continue
+			current.__dict__["_reduced"] = result
+			del rewritten[current]
+			waiting.discard(current)
+			worklist.pop()
+			continue
+
+		pending = [
+			child
+			for child in current._children()
+			if _normalform(child) is None
+		]
+		if len(pending) > 0:
+			worklist.extend(pending)
+			continue
+
+		for rule in current._rules:
+			result = rule(current)
+			if result is not None:
+				rewritten[current] = result
+				break
+		else:
+			current.__dict__["_normal"] = True
+			worklist.pop()
+
+	return _normalform(piece)
+
+def _tomult(piece):
+	'''"Bulk up" a reduced piece so that it can be used as part of a conc.'''
+	if hasattr(piece, "mults"):
+		piece = pattern(piece)
+	if hasattr(piece, "ranges") or hasattr(piece, "concs"):
+		piece = mult(piece, one)
+	return piece
+
+def _toconc(piece):
+	'''"Bulk up" a reduced piece so that it can be used as part of a pattern.'''
+	if hasattr(piece, "ranges") or hasattr(piece, "concs"):
+		piece = mult(piece, one)
+	if hasattr(piece, "multiplicand"):
+		piece = conc(piece)
+	return piece
+
+def _tomultiplicand(piece):
+	'''"Bulk up" a reduced piece so that it can be used as a multiplicand.'''
+	if hasattr(piece, "multiplicand"):
+		piece = conc(piece)
+	if hasattr(piece, "mults"):
+		piece = pattern(piece)
+	return piece
 
 def parse(string):
 	'''
@@ -145,6 +265,56 @@ def from_fsm(f):
 
 	return brz[f.initial][outside].reduce()
 
+def from_words(words):
+	'''
+		Return a lego piece matching exactly the supplied literal strings, and
+		nothing else. The words are threaded through a trie which is then turned
+		inside out into nested patterns, so shared prefixes are factored out in
+		time linear in the total length of the words. E.g. "foo", "foobar" and
+		"baz" yield "baz|foo(bar)?".
+		The result is equivalent to, but not necessarily identical with,
+		`parse("|".join(words)).reduce()`: by the time that alternation reaches
+		the trie, other rules (such as charclass merging) may already have
+		rearranged some of its branches.
+	'''
+	return _factorwords(words).reduce()
+
+def _factorwords(words):
+	'''
+		Build a trie from the supplied words and return it as an unreduced
+		pattern.
+	'''
+	trie = {}
+	for word in words:
+		node = trie
+		for char in word:
+			node = node.setdefault(char, {})
+		node[None] = None
+	return _fromtrie(trie)
+
+def _fromtrie(trie):
+	'''
+		Turn a trie into a pattern. Each key is a character leading to a
+		subtrie. A key of None marks the end of a word. Chains of nodes with only
+		one way out become a single conc.
+	'''
+	concs = []
+	for char in trie:
+		if char is None:
+			concs.append(emptystring)
+			continue
+		chars = [char]
+		node = trie[char]
+		while len(node) == 1 and None not in node:
+			char = [c for c in node][0]
+			chars.append(char)
+			node = node[char]
+		mults = [mult(charclass(char), one) for char in chars]
+		if node != {None: None}:
+			mults.append(mult(_fromtrie(node), one))
+		concs.append(conc(*mults))
+	return pattern(*concs)
+
 def static(string, i, static):
 	j = i+len(static)
 	if string[i:j] == static:
@@ -168,7 +338,7 @@ def read_until(string, i, stop_char):
 		i += 1
 	return i + 1, string[start:i]
 
-class lego:
+class lego(object):
 	'''
 		Parent class for all lego pieces.
 		All lego pieces have some things in common. This parent class mainly
@@ -182,6 +352,33 @@ class lego:
 		'''
 		raise Exception("This object is immutable.")
 
+	def __eq__(self, other):
+		'''
+			Lego pieces are interned (see `_intern()`), so two of them are equal
+			if and only if they are the same object.
+		'''
+		return self is other
+
+	def __ne__(self, other):
+		return self is not other
+
+	def __hash__(self):
+		return self._hash
+
+	def __copy__(self):
+		'''Lego pieces are immutable and interned, so a copy is the original.'''
+		return self
+
+	def __deepcopy__(self, memo):
+		return self
+
+	def __reduce__(self):
+		'''
+			Unpickling has to go back through the constructor, so that the
+			resulting piece is interned too.
+		'''
+		raise Exception("Not implemented")
+
 	def to_fsm(self, alphabet):
 		'''
 			Return the present lego piece in the form of a finite state machine,
@@ -194,6 +391,23 @@ class lego:
 		'''
 		raise Exception("Not implemented")
 
+	def to_nfa(self, alphabet=None):
+		'''
+			Like to_fsm(), but return an `fsm.nfa`. Concatenation, alternation
+			and repetition are then structural, and subset construction happens
+			only once, when the NFA is finally converted with to_fsm().
+		'''
+		raise Exception("Not implemented")
+
+	def to_sfsm(self):
+		'''
+			Return the present lego piece in the form of a symbolic finite state
+			machine (see the sfsm module), whose transitions are labelled with
+			charclasses instead of single characters. No alphabet is needed.
+		'''
+		from greenery import sfsm
+		return sfsm.from_lego(self)
+
 	def __repr__(self):
 		'''
 			Return a string approximating the instantiation line
@@ -231,20 +445,29 @@ class lego:
 			raise Exception("Could not parse '" + string + "' beyond index " + str(i))
 		return obj
 
-	@reduce_after
 	def reduce(self):
 		'''
 			The most important and algorithmically complex method. Takes the current
 			lego piece and simplifies it in every way possible, returning a simpler
 			lego piece which is quite probably not of the same class as the original.
-			Approaches vary by the class of the present lego piece.
+			Approaches vary by the class of the present lego piece: each class lists
+			its own rewrite rules in `_rules`, and `_rewrite()` applies them.
 
-			It is critically important to (1) always call reduce() on whatever you're
-			returning before you return it and therefore (2) always return something
-			STRICTLY SIMPLER than the current object. Otherwise, infinite loops become
-			possible in reduce() calls.
+			It is critically important that every rule return something STRICTLY
+			SIMPLER than the piece it was given (or None, if it does not apply).
+			Otherwise, infinite loops become possible in reduce() calls.
 		'''
-		raise Exception("Not implemented")
+		return _rewrite(self)
+
+	def _children(self):
+		'''
+			Return the lego pieces directly inside this one. These are reduced
+			before any of the present piece's rules are tried.
+		'''
+		return ()
+
+	# Rewrite rules for reduce(), in order of preference.
+	_rules = ()
 
 	def __add__(self, other):
 		'''
@@ -331,6 +554,47 @@ class lego:
 		'''
 		raise Exception("Not implemented")
 
+	def nullable(self):
+		'''
+			Return True if the present lego piece can match the empty string.
+		'''
+		raise Exception("Not implemented")
+
+	def derive(self, symbol):
+		'''
+			Return the Brzozowski derivative of the present lego piece with respect
+			to `symbol` (which may be `fsm.anything_else`): a pattern matching
+			every string which, prefixed with `symbol`, self would match.
+			The result is always a flat pattern of concs and is not reduce()d.
+			Because pattern stores its concs as a frozenset and all pieces are
+			interned, derivatives which are equal up to associativity,
+			commutativity and idempotence of "|" are the very same object.
+		'''
+		raise Exception("Not implemented")
+
+	def to_dfa(self, alphabet=None):
+		'''
+			An alternative to to_fsm(). Rather than building an FSM for every leaf
+			and composing them, crawl the derivatives of the present lego piece
+			directly: each distinct derivative is one state of the resulting DFA,
+			final if it is nullable. This is usually close to minimal already.
+		'''
+		if alphabet is None:
+			alphabet = self.alphabet()
+
+		initial = pattern(_toconc(self)) if not hasattr(self, "concs") else self
+
+		def final(state):
+			return state.nullable()
+
+		def follow(state, symbol):
+			next = state.derive(symbol)
+			if len(next.concs) == 0:
+				raise fsm.OblivionError
+			return next
+
+		return fsm.crawl(alphabet, initial, final, follow)
+
 	def matches(self, string):
 		return self.to_fsm().accepts(string)
 
@@ -362,28 +626,15 @@ class lego:
 
 
 class anchor(lego):
-	def __init__(self, v):
-		self.__dict__["v"] = v
+	def __new__(cls, v):
+		return _intern(cls, v, v=v)
 
-	def __eq__(self, other):
-		try:
-			return self.v == other.v
-		except AttributeError:
-			return False
-
-	def __ne__(self, other):
-		return not self.__eq__(other)
-
-	def __hash__(self):
-		return hash(self.v)
+	def __reduce__(self):
+		return (anchor, (self.v,))
 
 	def __str__(self):
 		return anchors[self]
 
-	@reduce_after
-	def reduce(self):
-		return self
-
 	def __repr__(self):
 		return "anchor(%s)" % anchors[self]
 
@@ -405,36 +656,125 @@ class anchor(lego):
 		return self
 
 
+def _ranges(codepoints):
+	'''
+		Turn an iterable of integer code points, or of (first, last) inclusive
+		intervals of code points, into the canonical form used by charclass: a
+		sorted tuple of disjoint, non-adjacent (first, last) intervals.
+	'''
+	intervals = sorted(
+		(x, x) if isinstance(x, int) else x
+		for x in codepoints
+	)
+	ranges = []
+	for (first, last) in intervals:
+		if len(ranges) > 0 and first <= ranges[-1][1] + 1:
+			if last > ranges[-1][1]:
+				ranges[-1] = (ranges[-1][0], last)
+		else:
+			ranges.append((first, last))
+	return tuple(ranges)
+
+def _union(a, b):
+	'''Union of two canonical tuples of intervals.'''
+	return _ranges(a + b)
+
+def _intersection(a, b):
+	'''Intersection of two canonical tuples of intervals, in a single sweep.'''
+	ranges = []
+	i = 0
+	j = 0
+	while i < len(a) and j < len(b):
+		first = max(a[i][0], b[j][0])
+		last = min(a[i][1], b[j][1])
+		if first <= last:
+			ranges.append((first, last))
+		if a[i][1] < b[j][1]:
+			i += 1
+		else:
+			j += 1
+	return tuple(ranges)
+
+def _difference(a, b):
+	'''Remove the intervals of `b` from those of `a`, in a single sweep.'''
+	ranges = []
+	j = 0
+	for (first, last) in a:
+		while j < len(b) and b[j][1] < first:
+			j += 1
+		k = j
+		while k < len(b) and b[k][0] <= last:
+			if b[k][0] > first:
+				ranges.append((first, b[k][0] - 1))
+			first = max(first, b[k][1] + 1)
+			k += 1
+		if first <= last:
+			ranges.append((first, last))
+	return tuple(ranges)
+
+def _fromranges(ranges, negated):
+	'''Python 2 can't pickle a classmethod, so unpickling comes here.'''
+	return charclass.fromranges(ranges, negated)
+
 class charclass(lego):
 	'''
-		A charclass is basically a frozenset of symbols. The reason for the
+		A charclass is basically a set of symbols. The reason for the
 		charclass object instead of using frozenset directly is to allow us to
 		set a "negated" flag. A charclass with the negation flag set is assumed
 		to contain every symbol that is in the alphabet of all symbols but not
-		explicitly listed inside the frozenset. e.g. [^a]. This is very handy
+		explicitly listed inside the set. e.g. [^a]. This is very handy
 		if the full alphabet is extremely large, but also requires dedicated
 		combination functions.
+		The set is stored as `ranges`, a sorted tuple of disjoint (first, last)
+		intervals of code points, so "[\\x00-\\uffff]" costs as little as "[a-z]".
+		The equivalent frozenset is still available as `chars`, but is only built
+		on demand.
 	'''
 
-	def __init__(self, chars=set(), negateMe=False):
-		chars = frozenset(chars)
+	def __new__(cls, chars=set(), negateMe=False):
+		chars = set(chars)
 		# chars should consist only of chars
 		if fsm.anything_else in chars:
 			raise Exception("Can't put " + repr(fsm.anything_else) + " in a charclass")
-		self.__dict__["chars"]   = chars
-		self.__dict__["negated"] = negateMe
+		if len(chars) == 1:
+			i = ord(chars.pop())
+			ranges = ((i, i),)
+		else:
+			ranges = _ranges(ord(char) for char in chars)
+		return _intern(cls, (ranges, negateMe), ranges=ranges, negated=negateMe)
 
-	def __eq__(self, other):
-		try:
-			return self.chars == other.chars and self.negated == other.negated
-		except AttributeError:
-			return False
+	@classmethod
+	def fromranges(cls, ranges, negateMe=False):
+		'''
+			Construct a charclass directly from (first, last) inclusive intervals
+			of code points, e.g. `charclass.fromranges([(0x61, 0x7a)])` for "[a-z]".
+		'''
+		ranges = _ranges(ranges)
+		return _intern(cls, (ranges, negateMe), ranges=ranges, negated=negateMe)
 
-	def __ne__(self, other):
-		return not self.__eq__(other)
+	def __reduce__(self):
+		return (_fromranges, (self.ranges, self.negated))
 
-	def __hash__(self):
-		return hash((self.chars, self.negated))
+	@property
+	def chars(self):
+		'''The (positive) set of characters, as a frozenset. Built on demand.'''
+		if "_chars" not in self.__dict__:
+			self.__dict__["_chars"] = frozenset(
+				chr(i)
+				for (first, last) in self.ranges
+				for i in range(first, last + 1)
+			)
+		return self._chars
+
+	def __contains__(self, char):
+		'''
+			Test whether the single character `char` is matched by this charclass,
+			taking negation into account. Binary search over the ranges.
+		'''
+		i = ord(char)
+		j = bisect.bisect_right(self.ranges, (i, sys.maxunicode + 1)) - 1
+		inside = j >= 0 and self.ranges[j][0] <= i <= self.ranges[j][1]
+		return inside != self.negated
 
 	def __mul__(self, ier):
 		# e.g. "a" * {0,1} = "a?"
@@ -477,9 +817,8 @@ class charclass(lego):
 			return "[^" + self.escape() + "]"
 
 		# single character, not contained inside square brackets.
-		if len(self.chars) == 1:
-			# Python lacks the Axiom of Choice
-			char = "".join(self.chars)
+		if len(self.ranges) == 1 and self.ranges[0][0] == self.ranges[0][1]:
+			char = chr(self.ranges[0][0])
 
 			# e.g. if char is "\t", return "\\t"
 			if char in escapes.keys():
@@ -515,58 +854,31 @@ class charclass(lego):
 
 			return char
 
-		def recordRange():
+		def recordRange(first, last):
 			# there's no point in putting a range when the whole thing is
 			# 3 characters or fewer.
-			if len(currentRange) < 4:
-				return "".join(escapeChar(char) for char in currentRange)
+			if last - first < 3:
+				return "".join(escapeChar(chr(i)) for i in range(first, last + 1))
 			else:
-				return escapeChar(currentRange[0]) + "-" + escapeChar(currentRange[-1])
-
-		output = ""
-
-		# use shorthand for known character ranges
-		# note the nested processing order. DO NOT process \d before processing
-		# \w. if more character class constants arise which do not nest nicely,
-		# a problem will arise because there is no clear ordering to use...
-
-		# look for ranges
-		currentRange = ""
-		for char in sorted(self.chars, key=ord):
-
-			# range is not empty: new char must fit after previous one
-			if len(currentRange) > 0:
+				return escapeChar(chr(first)) + "-" + escapeChar(chr(last))
 
-				i = ord(char)
-
-				# char doesn't fit old range: restart
-				if i != ord(currentRange[-1]) + 1:
-					output += recordRange()
-					currentRange = ""
-
-			currentRange += char
-
-		output += recordRange()
-
-		return output
+		return "".join(recordRange(first, last) for (first, last) in self.ranges)
 
 	def to_fsm(self, alphabet=None):
 		if alphabet is None:
 			alphabet = self.alphabet()
 
-		# 0 is initial, 1 is final
-
-		# If negated, make a singular FSM accepting any other characters
-		if self.negated:
-			map = {
-				0: dict([(symbol, 1) for symbol in alphabet - self.chars]),
-			}
-
-		# If normal, make a singular FSM accepting only these characters
-		else:
-			map = {
-				0: dict([(symbol, 1) for symbol in self.chars]),
-			}
+		# 0 is initial, 1 is final. Test each symbol of the alphabet against
+		# the ranges, rather than expanding the charclass into its characters:
+		# "[^a]" or "[\x00-\uffff]" would otherwise cost tens of thousands of
+		# symbols. `anything_else` is matched only by negated charclasses.
+		map = {
+			0: dict([
+				(symbol, 1)
+				for symbol in alphabet
+				if (self.negated if symbol is fsm.anything_else else symbol in self)
+			]),
+		}
 
 		return fsm.fsm(
 			alphabet = alphabet,
@@ -576,29 +888,45 @@ class charclass(lego):
 			map      = map,
 		)
 
+	def to_nfa(self, alphabet=None):
+		return self.to_fsm(alphabet).to_nfa()
+
 	def __repr__(self):
 		string = ""
 		if self.negated is True:
 			string += "~"
 		string += "charclass("
-		if len(self.chars) > 0:
-			string += repr("".join(str(char) for char in sorted(self.chars, key=str)))
+		if len(self.ranges) > 0:
+			string += repr("".join(
+				chr(i)
+				for (first, last) in self.ranges
+				for i in range(first, last + 1)
+			))
 		string += ")"
 		return string
 
-	@reduce_after
-	def reduce(self):
-		# Charclasses cannot be reduced().
-		return self
-
 	def __add__(self, other):
 		return mult(self, one) + other
 
 	def alphabet(self):
-		return {fsm.anything_else} | self.chars
+		# Straight from the ranges, so as not to keep a copy in `chars`
+		alphabet = {fsm.anything_else}
+		for (first, last) in self.ranges:
+			alphabet.update(chr(i) for i in range(first, last + 1))
+		return alphabet
 
 	def empty(self):
-		return len(self.chars) == 0 and self.negated == False
+		return len(self.ranges) == 0 and self.negated == False
+
+	def nullable(self):
+		return False
+
+	def derive(self, symbol):
+		if symbol is fsm.anything_else:
+			matched = self.negated
+		else:
+			matched = symbol in self
+		return pattern(emptystring) if matched else pattern()
 
 	@classmethod
 	def match(cls, string, i = 0):
@@ -655,16 +983,19 @@ class charclass(lego):
 
 			return char, j
 
+		# The functions below all return (first, last) intervals of code points
 		def matchClassInteriorFirst(string, i):
 			try:
-				return select_static(string, i, *charclass.classFirstOrLastCharSpecialCases)
+				char, j = select_static(string, i, *charclass.classFirstOrLastCharSpecialCases)
+				return [(ord(char), ord(char))], j
 			except nomatch:
 				pass
 			return matchClassInterior1(string, i)
 
 		def matchClassInteriorLast(string, i):
 			try:
-				return select_static(string, i, *charclass.classFirstOrLastCharSpecialCases)
+				char, j = select_static(string, i, *charclass.classFirstOrLastCharSpecialCases)
+				return [(ord(char), ord(char))], j
 			except nomatch:
 				pass
 			return matchClassInterior1(string, i)
@@ -674,7 +1005,8 @@ class charclass(lego):
 			# Attempt 1: shorthand e.g. "\w"
 			for key in charclass.shorthand:
 				try:
-					return key, static(string, i, charclass.shorthand[key])
+					j = static(string, i, charclass.shorthand[key])
+					return [(ord(char), ord(char)) for char in key], j
 				except nomatch:
 					pass
 
@@ -691,18 +1023,16 @@ class charclass(lego):
 				if firstIndex >= lastIndex:
 					raise nomatch("Range '" + first + "' to '" + last + "' not allowed")
 
-				chars = "".join([
-					chr(i) for i in range(firstIndex, lastIndex + 1)
-				])
-				return chars, k
+				return [(firstIndex, lastIndex)], k
 			except nomatch:
 				pass
 
 			# Attempt 3: just a character on its own
-			return matchInternalChar(string, i)
+			char, j = matchInternalChar(string, i)
+			return [(ord(char), ord(char))], j
 
 		def matchClassInterior(string, i):
-			internals = ""
+			internals = []
 			try:
 				internal, i = matchClassInteriorFirst(string, i)
 				internals += internal
@@ -726,18 +1056,18 @@ class charclass(lego):
 		# "[^dsgsdg]"
 		try:
 			j = static(string, i, "[^")
-			chars, j = matchClassInterior(string, j)
+			ranges, j = matchClassInterior(string, j)
 			j = static(string, j, "]")
-			return ~charclass(chars), j
+			return charclass.fromranges(ranges, negateMe=True), j
 		except nomatch:
 			pass
 
 		# "[sdfsf]"
 		try:
 			j = static(string, i, "[")
-			chars, j = matchClassInterior(string, j)
+			ranges, j = matchClassInterior(string, j)
 			j = static(string, j, "]")
-			return charclass(chars), j
+			return charclass.fromranges(ranges), j
 		except nomatch:
 			pass
 
@@ -775,7 +1105,7 @@ class charclass(lego):
 			Negate the current charclass. e.g. [ab] becomes [^ab]. Call
 			using "charclass2 = ~charclass1"
 		'''
-		return charclass(self.chars, negateMe=not self.negated)
+		return charclass.fromranges(self.ranges, negateMe=not self.negated)
 
 	def __or__(self, other):
 		try:
@@ -785,13 +1115,13 @@ class charclass(lego):
 			# A OR B
 			if self.negated:
 				if other.negated:
-					return ~charclass(self.chars & other.chars)
-				return ~charclass(self.chars - other.chars)
+					return ~charclass.fromranges(_intersection(self.ranges, other.ranges))
+				return ~charclass.fromranges(_difference(self.ranges, other.ranges))
 			if other.negated:
-				return ~charclass(other.chars - self.chars)
-			return charclass(self.chars | other.chars)
+				return ~charclass.fromranges(_difference(other.ranges, self.ranges))
+			return charclass.fromranges(_union(self.ranges, other.ranges))
 
-		# "other" lacks attribute "negated" or "chars"
+		# "other" lacks attribute "negated" or "ranges"
 		# "other" is not a charclass
 		# Never mind!
 		except AttributeError:
@@ -805,13 +1135,13 @@ class charclass(lego):
 			# A AND B
 			if self.negated:
 				if other.negated:
-					return ~charclass(self.chars | other.chars)
-				return charclass(other.chars - self.chars)
+					return ~charclass.fromranges(_union(self.ranges, other.ranges))
+				return charclass.fromranges(_difference(other.ranges, self.ranges))
 			if other.negated:
-				return charclass(self.chars - other.chars)
-			return charclass(self.chars & other.chars)
+				return charclass.fromranges(_difference(self.ranges, other.ranges))
+			return charclass.fromranges(_intersection(self.ranges, other.ranges))
 
-		# "other" lacks attribute "negated" or "chars"
+		# "other" lacks attribute "negated" or "ranges"
 		# "other" is not a charclass
 		# Never mind!
 		except AttributeError:
@@ -820,12 +1150,24 @@ class charclass(lego):
 	def __reversed__(self):
 		return self
 
-class bound:
+class bound(object):
 	'''An integer but sometimes also possibly infinite (None)'''
-	def __init__(self, v):
+	def __new__(cls, v):
 		if not v is None and v < 0:
 			raise Exception("Invalid bound: " + repr(v))
-		self.__dict__['v'] = v
+		return _intern(cls, v, v=v)
+
+	def __setattr__(self, name, value):
+		raise Exception("This object is immutable.")
+
+	def __copy__(self):
+		return self
+
+	def __deepcopy__(self, memo):
+		return self
+
+	def __reduce__(self):
+		return (bound, (self.v,))
 
 	def __repr__(self):
 		return "bound(" + repr(self.v) + ")"
@@ -870,16 +1212,14 @@ class bound:
 		return inf, i
 
 	def __eq__(self, other):
-		try:
-			return self.v == other.v
-		except AttributeError:
-			return False
+		'''Bounds are interned, so equality is identity.'''
+		return self is other
 
 	def __ne__(self, other):
-		return not self == other
+		return self is not other
 
 	def __hash__(self):
-		return hash(self.v)
+		return self._hash
 
 	def __lt__(self, other):
 		if self == inf:
@@ -927,7 +1267,7 @@ class bound:
 			return self
 		return bound(self.v - other.v)
 
-class multiplier:
+class multiplier(object):
 	'''
 		A min and a max. The vast majority of characters in regular
 		expressions occur without a specific multiplier, which is implicitly
@@ -938,7 +1278,7 @@ class multiplier:
 		"zero" to exist, which actually are quite useful in their own special way.
 	'''
 
-	def __init__(self, min, max, greedy=True):
+	def __new__(cls, min, max, greedy=True):
 		if min == inf:
 			raise Exception("Minimum bound of a multiplier can't be " + repr(inf))
 		if min > max:
@@ -949,23 +1289,35 @@ class multiplier:
 		mandatory = min
 		optional = max - min
 
-		self.__dict__['min'] = min
-		self.__dict__['max'] = max
-		self.__dict__['greedy'] = greedy
-		self.__dict__['mandatory'] = mandatory
-		self.__dict__['optional'] = optional
+		return _intern(cls, (min, max, greedy),
+			min       = min,
+			max       = max,
+			greedy    = greedy,
+			mandatory = mandatory,
+			optional  = optional,
+		)
+
+	def __setattr__(self, name, value):
+		raise Exception("This object is immutable.")
+
+	def __copy__(self):
+		return self
+
+	def __deepcopy__(self, memo):
+		return self
+
+	def __reduce__(self):
+		return (multiplier, (self.min, self.max, self.greedy))
 
 	def __eq__(self, other):
-		try:
-			return self.min == other.min and self.max == other.max and self.greedy == other.greedy
-		except AttributeError:
-			return False
+		'''Multipliers are interned, so equality is identity.'''
+		return self is other
 
 	def __ne__(self, other):
-		return not self.__eq__(other)
+		return self is not other
 
 	def __hash__(self):
-		return hash((self.min, self.max, self.greedy))
+		return self._hash
 
 	def __repr__(self):
 		return "multiplier(" + repr(self.min) + ", " + repr(self.max) + ")"
@@ -1118,29 +1470,29 @@ class mult(lego):
 		multipliers like "*" (min = 0, max = inf) and so on.
 
 		e.g. a, b{2}, c?, d*, [efg]{2,5}, f{2,}, (anysubpattern)+, .*, and so on
-	'''
-
-	def __init__(self, cand, ier):
-		self.__dict__["multiplicand"] = cand
-		self.__dict__["multiplier"]   = ier
 
-	def __eq__(self, other):
-		try:
-			return self.multiplicand == other.multiplicand \
-			and self.multiplier == other.multiplier
-		except AttributeError:
-			return False
+		A mult parsed from a named group, e.g. "(?P<name>...)", also records
+		its `group_name`, for submatch extraction (see `tdfa`). Otherwise
+		`group_name` is None. Reducing a mult discards its name.
+	'''
 
-	def __ne__(self, other):
-		return not self.__eq__(other)
+	def __new__(cls, cand, ier, group_name=None):
+		# A named group, e.g. "(?P<year>[0-9]{4})", is a distinct piece from
+		# the same mult without a name
+		key = (cand, ier) if group_name is None else (cand, ier, group_name)
+		return _intern(cls, key, multiplicand=cand, multiplier=ier, group_name=group_name)
 
-	def __hash__(self):
-		return hash((self.multiplicand, self.multiplier))
+	def __reduce__(self):
+		if self.group_name is None:
+			return (mult, (self.multiplicand, self.multiplier))
+		return (mult, (self.multiplicand, self.multiplier, self.group_name))
 
 	def __repr__(self):
 		string = "mult("
 		string += repr(self.multiplicand)
 		string += ", " + repr(self.multiplier)
+		if self.group_name is not None:
+			string += ", " + repr(self.group_name)
 		string += ")"
 		return string
 
@@ -1181,7 +1533,7 @@ class mult(lego):
 		return mult(nothing, zero)
 
 	def __and__(self, other):
-		if hasattr(other, "chars"):
+		if hasattr(other, "ranges"):
 			other = mult(other, one)
 
 		# If two mults are given which have a common multiplicand, the shortcut
@@ -1206,12 +1558,39 @@ class mult(lego):
 	def empty(self):
 		return self.multiplicand.empty() and self.multiplier.min > bound(0)
 
-	@reduce_after
-	def reduce(self):
+	def nullable(self):
+		return self.multiplier.min == bound(0) or self.multiplicand.nullable()
+
+	def derive(self, symbol):
+		# e.g. d("(ab){2,5}") = d("ab")(ab){1,4}
+		if self.multiplier.max == bound(0):
+			return pattern()
+		one_less = multiplier(
+			bound(max(self.multiplier.min.v - 1, 0)),
+			self.multiplier.max - bound(1),
+			self.multiplier.greedy,
+		)
+		rest = () if one_less.max == bound(0) else (mult(self.multiplicand, one_less),)
+		return pattern(*(
+			conc(*(c.mults + rest))
+			for c in self.multiplicand.derive(symbol).concs
+		))
+
+	def _children(self):
+		return (self.multiplicand,)
+
+	def _nothing(self):
 		# Can't match anything: reduce to nothing
 		if self.empty():
 			return nothing
 
+	def _anonymous(self):
+		# Reduction is about the strings matched, which group names don't
+		# affect, and a name would stop this mult merging with its neighbours
+		if self.group_name is not None:
+			return mult(self.multiplicand, self.multiplier)
+
+	def _optionalpattern(self):
 		# If our multiplicand is a pattern containing an empty conc()
 		# we can pull that "optional" bit out into our own multiplier
 		# instead.
@@ -1230,6 +1609,7 @@ class mult(lego):
 			# self.multiplicand has no attribute "concs"; isn't a pattern; never mind
 			pass
 
+	def _emptystring(self):
 		# If we have an empty multiplicand, we can only match it
 		# zero times
 		if self.multiplicand.empty() \
@@ -1242,20 +1622,18 @@ class mult(lego):
 		if self.multiplier == zero:
 			return emptystring
 
+	def _singular(self):
 		# no point multiplying in the singular
 		if self.multiplier == one:
 			return self.multiplicand
 
-		# Try recursively reducing our internal.
-		reduced = self.multiplicand.reduce()
-		# "bulk up" smaller lego pieces to pattern if need be
-		if hasattr(reduced, "multiplicand"):
-			reduced = conc(reduced)
-		if hasattr(reduced, "mults"):
-			reduced = pattern(reduced)
+	def _reducechildren(self):
+		# Pick up our (already reduced) internal.
+		reduced = _tomultiplicand(_normalform(self.multiplicand))
 		if reduced != self.multiplicand:
 			return mult(reduced, self.multiplier)
 
+	def _singlemult(self):
 		# If our multiplicand is a pattern containing a single conc
 		# containing a single mult, we can separate that out a lot
 		# e.g. ([ab])* -> [ab]*
@@ -1273,9 +1651,20 @@ class mult(lego):
 			# self.multiplicand has no attribute "concs"; isn't a pattern; never mind
 			pass
 
-		return self
+	_rules = (
+		_nothing,
+		_anonymous,
+		_optionalpattern,
+		_emptystring,
+		_singular,
+		_reducechildren,
+		_singlemult,
+	)
 
 	def __str__(self):
+		if self.group_name is not None:
+			return "(?P<" + self.group_name + ">" + str(self.multiplicand) + ")" + str(self.multiplier)
+
 		# recurse into subpattern
 		if hasattr(self.multiplicand, "concs"):
 			output = "(" + str(self.multiplicand) + ")"
@@ -1320,19 +1709,33 @@ class mult(lego):
 
 		return mandatory + optional
 
+	def to_nfa(self, alphabet=None):
+		if alphabet is None:
+			alphabet = self.alphabet()
+
+		unit = self.multiplicand.to_nfa(alphabet)
+		mandatory = unit * self.multiplier.mandatory.v
+		if self.multiplier.optional == inf:
+			optional = unit.star()
+		else:
+			optional = (fsm.nfa_epsilon(alphabet) | unit) * self.multiplier.optional.v
+		return mandatory + optional
+
 	@classmethod
 	def match(cls, string, i = 0):
 
 		def matchMultiplicand(string, i):
 			# explicitly non-capturing "(?:...)" syntax. No special significance
+			# The name of a named group "(?P<name>...)" is kept
 			try:
 				j = static(string, i, "(?")
 				st, j = select_static(string, j, ':', 'P<')
+				group_name = None
 				if st == 'P<':
 					j, group_name = read_until(string, j, '>')
 				multiplicand, j = pattern.match(string, j)
 				j = static(string, j, ")")
-				return multiplicand, j
+				return multiplicand, group_name, j
 			except nomatch:
 				pass
 
@@ -1341,19 +1744,20 @@ class mult(lego):
 				j = static(string, i, "(")
 				multiplicand, j = pattern.match(string, j)
 				j = static(string, j, ")")
-				return multiplicand, j
+				return multiplicand, None, j
 			except nomatch:
 				pass
 
 			# Just a charclass on its own
-			return charclass.match(string, i)
+			multiplicand, j = charclass.match(string, i)
+			return multiplicand, None, j
 
-		multiplicand, j = matchMultiplicand(string, i)
+		multiplicand, group_name, j = matchMultiplicand(string, i)
 		multiplier_, j = multiplier.match(string, j)
-		return mult(multiplicand, multiplier_), j
+		return mult(multiplicand, multiplier_, group_name), j
 
 	def __reversed__(self):
-		return mult(reversed(self.multiplicand), self.multiplier)
+		return mult(reversed(self.multiplicand), self.multiplier, self.group_name)
 
 class conc(lego):
 	'''
@@ -1363,20 +1767,12 @@ class conc(lego):
 		To express the empty string, use an empty conc, conc().
 	'''
 
-	def __init__(self, *mults):
-		self.__dict__["mults"] = tuple(mults)
-
-	def __eq__(self, other):
-		try:
-			return self.mults == other.mults
-		except AttributeError:
-			return False
+	def __new__(cls, *mults):
+		mults = tuple(mults)
+		return _intern(cls, mults, mults=mults)
 
-	def __ne__(self, other):
-		return not self.__eq__(other)
-
-	def __hash__(self):
-		return hash(self.mults)
+	def __reduce__(self):
+		return (conc, self.mults)
 
 	def __repr__(self):
 		string = "conc("
@@ -1392,7 +1788,7 @@ class conc(lego):
 
 	def __add__(self, other):
 		# other must be a conc too
-		if hasattr(other, "chars") or hasattr(other, "concs"):
+		if hasattr(other, "ranges") or hasattr(other, "concs"):
 			other = mult(other, one)
 		if hasattr(other, "multiplicand"):
 			other = conc(other)
@@ -1405,32 +1801,27 @@ class conc(lego):
 	def __and__(self, other):
 		return pattern(self) & other
 
-	@reduce_after
-	def reduce(self):
+	def _children(self):
+		return self.mults
+
+	def _nothing(self):
 		# Can't match anything
 		if self.empty():
 			return nothing
 
+	def _singular(self):
 		# no point concatenating one thing (note: concatenating 0 things is
 		# entirely valid)
 		if len(self.mults) == 1:
 			return self.mults[0]
 
-		# Try recursively reducing our internals
-		reduced = [m.reduce() for m in self.mults]
-		# "bulk up" smaller lego pieces to concs if need be
-		reduced = [
-			pattern(x) if hasattr(x, "mults") else x
-			for x in reduced
-		]
-		reduced = [
-			mult(x, one) if hasattr(x, "chars") or hasattr(x, "concs") else x
-			for x in reduced
-		]
-		reduced = tuple(reduced)
+	def _reducechildren(self):
+		# Pick up our (already reduced) internals
+		reduced = tuple(_tomult(_normalform(m)) for m in self.mults)
 		if reduced != self.mults:
 			return conc(*reduced)
 
+	def _emptypattern(self):
 		# Conc contains "()" (i.e. a mult containing only a pattern containing the
 		# empty string)? That can be removed e.g. "a()b" -> "ab"
 		for i in range(len(self.mults)):
@@ -1438,6 +1829,7 @@ class conc(lego):
 				new = self.mults[:i] + self.mults[i+1:]
 				return conc(*new)
 
+	def _squish(self):
 		# multiple mults with identical multiplicands in a row?
 		# squish those together
 		# e.g. ab?b?c -> ab{0,2}c
@@ -1451,6 +1843,7 @@ class conc(lego):
 					new = self.mults[:i] + (squished,) + self.mults[i+2:]
 					return conc(*new)
 
+	def _flatten(self):
 		# Conc contains (among other things) a *singleton* mult containing a pattern
 		# with only one internal conc? Flatten out.
 		# e.g. "a(d(ab|a*c))" -> "ad(ab|a*c)"
@@ -1467,7 +1860,14 @@ class conc(lego):
 				# m.multiplicand has no attribute "concs"; isn't a pattern; never mind
 				pass
 
-		return self
+	_rules = (
+		_nothing,
+		_singular,
+		_reducechildren,
+		_emptypattern,
+		_squish,
+		_flatten,
+	)
 
 	def to_fsm(self, alphabet=None):
 		if alphabet is None:
@@ -1479,6 +1879,14 @@ class conc(lego):
 			fsm1 += m.to_fsm(alphabet)
 		return fsm1
 
+	def to_nfa(self, alphabet=None):
+		if alphabet is None:
+			alphabet = self.alphabet()
+
+		return fsm.nfa_epsilon(alphabet).concatenate(*[
+			m.to_nfa(alphabet) for m in self.mults
+		])
+
 	def alphabet(self):
 		return {fsm.anything_else}.union(*[m.alphabet() for m in self.mults])
 
@@ -1488,6 +1896,25 @@ class conc(lego):
 				return True
 		return False
 
+	def nullable(self):
+		for m in self.mults:
+			if not m.nullable():
+				return False
+		return True
+
+	def derive(self, symbol):
+		# d(xy) = d(x)y, or d(x)y|d(y) if x can match the empty string
+		concs = set()
+		for (i, m) in enumerate(self.mults):
+			rest = self.mults[i + 1:]
+			for c in m.derive(symbol).concs:
+				derived = conc(*(c.mults + rest))
+				if not derived.empty():
+					concs.add(derived)
+			if not m.nullable():
+				break
+		return pattern(*concs)
+
 	def __str__(self):
 		return "".join(str(m) for m in self.mults)
 
@@ -1505,6 +1932,26 @@ class conc(lego):
 			pass
 		return conc(*mults), i
 
+	def literal(self):
+		'''
+			If this conc matches exactly one string, e.g. "ab{2}c", return that
+			string, otherwise return None.
+		'''
+		string = ""
+		for m in self.mults:
+			try:
+				ranges = m.multiplicand.ranges
+				if m.multiplicand.negated \
+				or len(ranges) != 1 \
+				or ranges[0][0] != ranges[0][1] \
+				or m.multiplier.min != m.multiplier.max:
+					return None
+			except AttributeError:
+				# Not a mult, or the multiplicand isn't a charclass
+				return None
+			string += chr(ranges[0][0]) * m.multiplier.min.v
+		return string
+
 	def common(self, other, suffix=False):
 		'''
 			Return the common prefix of these two concs; that is, the largest conc
@@ -1603,20 +2050,12 @@ class pattern(lego):
 		1, a lower bound 1, and a multiplicand which is a new subpattern, "ghi|jkl".
 		This new subpattern again consists of two concs: "ghi" and "jkl".
 	'''
-	def __init__(self, *concs):
-		self.__dict__["concs"] = frozenset(concs)
-
-	def __eq__(self, other):
-		try:
-			return self.concs == other.concs
-		except AttributeError:
-			return False
+	def __new__(cls, *concs):
+		concs = frozenset(concs)
+		return _intern(cls, concs, concs=concs)
 
-	def __ne__(self, other):
-		return not self.__eq__(other)
-
-	def __hash__(self):
-		return hash(self.concs)
+	def __reduce__(self):
+		return (pattern, tuple(self.concs))
 
 	def __repr__(self):
 		string = "pattern("
@@ -1641,6 +2080,19 @@ class pattern(lego):
 				return False
 		return True
 
+	def nullable(self):
+		for c in self.concs:
+			if c.nullable():
+				return True
+		return False
+
+	def derive(self, symbol):
+		return pattern(*(
+			derived
+			for c in self.concs
+			for derived in c.derive(symbol).concs
+		))
+
 	def __and__(self, other):
 		# A deceptively simple method for an astoundingly difficult operation
 		alphabet = self.alphabet() | other.alphabet()
@@ -1651,7 +2103,7 @@ class pattern(lego):
 
 	def __or__(self, other):
 		# other must be a pattern too
-		if hasattr(other, "chars"):
+		if hasattr(other, "ranges"):
 			other = mult(other, one)
 		if hasattr(other, "multiplicand"):
 			other = conc(other)
@@ -1670,88 +2122,106 @@ class pattern(lego):
 		# 1+ elements.
 		return "|".join(sorted(str(c) for c in self.concs))
 
-	@reduce_after
-	def reduce(self):
+	def _children(self):
+		return self.concs
+
+	def _nothing(self):
 		# emptiness
 		if self.empty():
 			return nothing
 
+	def _emptyconc(self):
 		# If one of our internal concs is empty, remove it
 		for c in self.concs:
 			if c.empty():
 				new = self.concs - {c}
 				return pattern(*new)
 
+	def _singular(self):
 		# no point alternating among one possibility
 		if len(self.concs) == 1:
 			return [e for e in self.concs][0]
 
-		# Try recursively reducing our internals first.
-		reduced = [c.reduce() for c in self.concs]
-		# "bulk up" smaller lego pieces to concs if need be
-		reduced = [
-			mult(x, one) if hasattr(x, "chars") or hasattr(x, "concs") else x
-			for x in reduced
-		]
-		reduced = [
-			conc(x) if hasattr(x, "multiplicand") else x
-			for x in reduced
-		]
-		reduced = frozenset(reduced)
+	def _reducechildren(self):
+		# Pick up our (already reduced) internals.
+		reduced = frozenset(_toconc(_normalform(c)) for c in self.concs)
 		if reduced != self.concs:
 			return pattern(*reduced)
 
+	def _mergemultipliers(self):
 		# If this pattern contains several concs each containing just 1 mult and
 		# their multiplicands agree, we may be able to merge the multipliers
 		# e.g. "a{1,2}|a{3,4}|bc" -> "a{1,4}|bc"
-		oldconcs = list(self.concs) # so we can index the things
-		for i in range(len(oldconcs)):
-			conc1 = oldconcs[i]
-			if len(conc1.mults) != 1:
+		# Candidates are grouped by multiplicand, and each group is swept in
+		# order of lower bound so that every possible merge happens at once.
+		groups = {}
+		for c in self.concs:
+			if len(c.mults) == 1:
+				m = c.mults[0]
+				groups.setdefault(m.multiplicand, []).append(m.multiplier)
+
+		changed = False
+		newconcs = set(self.concs)
+		for multiplicand in groups:
+			multipliers = groups[multiplicand]
+			if len(multipliers) < 2:
 				continue
-			multiplicand1 = conc1.mults[0].multiplicand
-			for j in range(i + 1, len(oldconcs)):
-				conc2 = oldconcs[j]
-				if len(conc2.mults) != 1:
-					continue
-				multiplicand2 = conc2.mults[0].multiplicand
-				if multiplicand2 != multiplicand1:
-					continue
-				multiplicand = multiplicand1
-				multiplier1 = conc1.mults[0].multiplier
-				multiplier2 = conc2.mults[0].multiplier
-				if not multiplier1.canunion(multiplier2):
-					continue
-				multiplier = multiplier1 | multiplier2
-				newconcs = \
-					oldconcs[:i] + \
-					oldconcs[i + 1:j] + \
-					oldconcs[j + 1:] + \
-					[conc(mult(multiplicand, multiplier))]
-				return pattern(*newconcs)
+			multipliers.sort(key=lambda multiplier: multiplier.min.v)
+			merged = [multipliers[0]]
+			for multiplier in multipliers[1:]:
+				if merged[-1].canunion(multiplier):
+					merged[-1] = merged[-1] | multiplier
+				else:
+					merged.append(multiplier)
+			if len(merged) == len(multipliers):
+				continue
+			changed = True
+			for multiplier in multipliers:
+				newconcs.remove(conc(mult(multiplicand, multiplier)))
+			for multiplier in merged:
+				newconcs.add(conc(mult(multiplicand, multiplier)))
+		if changed:
+			return pattern(*newconcs)
 
+	def _mergecharclasses(self):
 		# If this pattern contains several concs each containing just 1 mult
 		# each containing just a charclass, with a multiplier of 1,
 		# then we can merge those branches together.
 		# e.g. "0|[1-9]|ab" -> "[0-9]|ab"
-		changed = False
-		merger = None
+		# Rather than OR-ing the charclasses together one at a time, note that
+		# A OR B OR ... OR ¬X OR ¬Y OR ... = ¬((X AND Y AND ...) - (A OR B OR ...))
+		# where A OR B OR ... is a single sort of all their ranges.
+		classes = []
 		rest = []
 		for c in self.concs:
 			if len(c.mults) == 1 \
 			and c.mults[0].multiplier == one \
-			and hasattr(c.mults[0].multiplicand, "chars"):
-				if merger is None:
-					merger = c.mults[0].multiplicand
-				else:
-					merger |= c.mults[0].multiplicand
-					changed = True
+			and hasattr(c.mults[0].multiplicand, "ranges"):
+				classes.append(c.mults[0].multiplicand)
 			else:
 				rest.append(c)
-		if changed:
-			rest.append(conc(mult(merger, one)))
-			return pattern(*rest)
+		if len(classes) < 2:
+			return None
+
+		included = []
+		excluded = None
+		for cc in classes:
+			if cc.negated:
+				if excluded is None:
+					excluded = cc.ranges
+				else:
+					excluded = _intersection(excluded, cc.ranges)
+			else:
+				included.extend(cc.ranges)
+		included = _ranges(included)
+		if excluded is None:
+			merger = charclass.fromranges(included)
+		else:
+			merger = ~charclass.fromranges(_difference(excluded, included))
+		rest.append(conc(mult(merger, one)))
+		return pattern(*rest)
 
+	def _mergeemptystring(self):
 		# If one of the present pattern's concs is the empty string, and
 		# there is another conc with a single mult whose lower bound is 0, we
 		# can omit the empty string.
@@ -1771,6 +2241,25 @@ class pattern(lego):
 					rest = self.concs - {conc(), c} | {m * qm}
 					return pattern(*rest)
 
+	def _factorliterals(self):
+		# If several of the present pattern's concs are plain literal strings
+		# sharing a first character, thread all of the literals through a trie
+		# and factor them in one go, e.g. "foo|foobar|fa|baz" -> "f(a|oo(bar)?)|baz"
+		# This is linear in the total length of the literals, which makes a
+		# big difference for alternations of many thousands of words.
+		words = []
+		rest = []
+		for c in self.concs:
+			word = c.literal()
+			if word is None:
+				rest.append(c)
+			else:
+				words.append(word)
+		if len(set(word[:1] for word in words)) == len(words):
+			return None
+		return pattern(*(rest + list(_factorwords(words).concs)))
+
+	def _factorprefix(self):
 		# If the present pattern's concs all have a common prefix, split
 		# that out. This increases the depth of the object
 		# but it is still arguably simpler/ripe for further reduction
@@ -1781,6 +2270,7 @@ class pattern(lego):
 			mults = prefix.mults + (mult(leftovers, one),)
 			return conc(*mults)
 
+	def _factorsuffix(self):
 		# Same but for suffixes.
 		# e.g. "xyz|stz -> (xy|st)z"
 		suffix = self._commonconc(suffix=True)
@@ -1789,7 +2279,18 @@ class pattern(lego):
 			mults = (mult(leftovers, one),) + suffix.mults
 			return conc(*mults)
 
-		return self
+	_rules = (
+		_nothing,
+		_emptyconc,
+		_singular,
+		_reducechildren,
+		_mergemultipliers,
+		_mergecharclasses,
+		_mergeemptystring,
+		_factorliterals,
+		_factorprefix,
+		_factorsuffix,
+	)
 
 	@classmethod
 	def match(cls, string, i = 0):
@@ -1853,6 +2354,14 @@ class pattern(lego):
 			fsm1 |= c.to_fsm(alphabet)
 		return fsm1
 
+	def to_nfa(self, alphabet=None):
+		if alphabet is None:
+			alphabet = self.alphabet()
+
+		return fsm.nfa_null(alphabet).union(*[
+			c.to_nfa(alphabet) for c in self.concs
+		])
+
 	def __reversed__(self):
 		return pattern(*(reversed(c) for c in self.concs))
 
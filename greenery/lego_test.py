@@ -3,7 +3,7 @@
 if __name__ == "__main__":
 	raise Exception("Test files can't be run directly. Use `python -m pytest greenery`")
 
-from greenery.lego import conc, mult, charclass, one, emptystring, star, plus, nothing, pattern, qm, d, multiplier, bound, w, s, W, D, S, dot, nomatch, inf, zero, parse, from_fsm, dollar, caret
+from greenery.lego import conc, mult, charclass, one, emptystring, star, plus, nothing, pattern, qm, d, multiplier, bound, w, s, W, D, S, dot, nomatch, inf, zero, parse, from_fsm, from_words, dollar, caret, lazy_star
 from greenery import fsm
 
 def test_new_reduce():
@@ -1327,6 +1327,12 @@ def test_block_comment_regex():
 def test_named_groups():
 	a = parse("(?P<ng1>abc)")
 	assert a.matches("abc")
+	m = list(a.concs)[0].mults[0]
+	assert m.group_name == "ng1"
+	assert str(a) == "(?P<ng1>abc)"
+	assert m != parse("(abc)")
+	assert reversed(m).group_name == "ng1"
+	assert str(a.reduce()) == "abc"
 
 def test_lazy_quantifier():
 	a = parse('a*?b+?c')
@@ -1349,4 +1355,182 @@ def test_parse_anchors():
 	a = parse(r"^a$")
 	mults = list(list(a.concs)[0].mults)
 	assert mults[0] == caret
-	assert mults[2] == dollar
\ No newline at end of file
+	assert mults[2] == dollar
+
+def test_interning():
+	# Structurally equal pieces are the very same object
+	assert charclass("ab") is charclass("ba")
+	assert multiplier(bound(0), inf) is star
+	assert mult(charclass("a"), star) is mult(charclass("a"), star)
+	assert conc.parse("a*b") is conc.parse("a*b")
+	assert pattern.parse("ab|cd") is pattern.parse("cd|ab")
+	assert parse("a|b").reduce() is charclass("ab")
+
+	# ...which still behave as sets and dict keys should
+	assert len({conc.parse("ab"), conc.parse("ab"), conc.parse("ba")}) == 2
+	assert charclass("a") != ~charclass("a")
+	assert mult(charclass("a"), star) != conc(mult(charclass("a"), star))
+
+def test_interning_pickle():
+	import pickle
+	p = parse("ab*|c*?|[^d]|$")
+	assert pickle.loads(pickle.dumps(p)) is p
+	assert pickle.loads(pickle.dumps(inf)) is inf
+	assert pickle.loads(pickle.dumps(lazy_star)) is lazy_star
+
+def test_interning_copy():
+	import copy
+	p = parse("ab*|c*?|[^d]|$")
+	assert copy.copy(p) is p
+	assert copy.deepcopy(p) is p
+	assert copy.deepcopy([p, star, bound(3)]) == [p, star, bound(3)]
+
+def test_interning_threads():
+	import threading
+	results = []
+	def build():
+		results.append([conc.parse("x" * i + "yz") for i in range(40)])
+	threads = [threading.Thread(target=build) for _ in range(4)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	for result in results[1:]:
+		assert all(a is b for (a, b) in zip(result, results[0]))
+
+def test_reduce_memoisation():
+	p = parse("(ab|ac)*(ab|ac)*|d|d")
+	reduced = p.reduce()
+	assert p._reduced is reduced
+	assert reduced._normal
+	assert p.reduce() is reduced
+	assert reduced.reduce() is reduced
+	# Shared subtrees are reduced once and remembered everywhere they appear
+	shared = mult.parse("(ab|ac)*")
+	conc(shared, mult(charclass("d"), one), shared).reduce()
+	assert "_reduced" in shared.__dict__
+
+def test_rewrite_engine():
+	# Reduction works bottom-up, so every piece of the original tree ends up
+	# with its normal form recorded
+	p = parse("(a|b)(c{1,2}|c{3,4}|())*(xyz|stz)")
+	reduced = p.reduce()
+	assert str(reduced) == "[ab]c*(st|xy)z"
+	def walk(piece):
+		yield piece
+		for child in piece._children():
+			for x in walk(child):
+				yield x
+	for piece in walk(p):
+		assert "_normal" in piece.__dict__ or "_reduced" in piece.__dict__
+
+	# A rule whose result contains the piece it rewrote is caught, rather
+	# than sending the worklist round forever
+	snowman = conc.parse("☃")
+	rules = conc._rules
+	conc._rules = (lambda c: pattern(c) if c is snowman else None,) + rules
+	try:
+		snowman.reduce()
+		assert False
+	except AssertionError:
+		assert False
+	except Exception:
+		pass
+	finally:
+		conc._rules = rules
+
+def test_wide_alternation_merging():
+	assert str(parse("a{1,2}|a{5}|bc|a{3,4}|a{7,}|a{6}").reduce()) == "a+|bc"
+	assert str(parse("a{1,2}|a{4}|b{2}|b").reduce()) == "aaaa|a{1,2}|b{1,2}"
+	assert parse("[^ab]|[^bc]|a|x").reduce() == ~charclass("b")
+	assert parse("|".join("a{" + str(i) + "}" for i in range(2000))).reduce() \
+		== mult(charclass("a"), multiplier(bound(0), bound(1999)))
+	assert parse("|".join(chr(0x100 + i) for i in range(2000))).reduce() \
+		== charclass(chr(0x100 + i) for i in range(2000))
+
+def test_literal_alternations():
+	assert conc.parse("ab{2}c").literal() == "abbc"
+	assert conc.parse("ab?c").literal() is None
+	assert conc.parse("a[bc]").literal() is None
+	assert str(from_words(["foo", "foobar", "baz"])) == "baz|foo(bar)?"
+	assert str(parse("foo|foobar|baz").reduce()) == "baz|foo(bar)?"
+	assert str(parse("foo|fa|foobar|baz|x*").reduce()) == "baz|f(a|oo(bar)?)|x*"
+	assert from_words([]) == nothing
+	assert from_words([""]) == emptystring
+
+	words = ["".join("abcd"[(i >> k) % 4] for k in range(0, 8, 2)) for i in range(0, 256, 3)]
+	words.append("ab")
+	piece = from_words(words)
+	assert piece.equivalent(parse("|".join(words)).reduce())
+	f = piece.to_fsm()
+	assert all(f.accepts(word) for word in words)
+	assert not f.accepts("abc")
+	assert not f.accepts("")
+	assert len(f) == len(words)
+
+def test_charclass_intervals():
+	# Unicode-wide classes cost one interval, not 65,536 characters
+	wide = charclass.parse("[\x00-￿]")
+	assert wide.ranges == ((0, 0xffff),)
+	assert "_chars" not in wide.__dict__
+	assert "ሴ" in wide
+	assert "\U00012345" not in wide
+	assert "\U00012345" in ~wide
+	assert str(wide) == "[\\x00-￿]"
+	assert str(~wide) == "[^\\x00-￿]"
+
+	az = charclass.fromranges([(0x61, 0x7a)])
+	assert az == charclass.parse("[a-z]")
+	assert az == charclass("abcdefghijklmnopqrstuvwxyz")
+	assert (az | charclass.parse("[0-9]")).ranges == ((0x30, 0x39), (0x61, 0x7a))
+	assert (az & charclass.parse("[m-￿]")) == charclass.parse("[m-z]")
+	assert (az & ~charclass.parse("[d-w]")) == charclass.parse("[a-cx-z]")
+	assert (wide & ~charclass.parse("[b-y]") & az) == charclass("az")
+	assert (~charclass.parse("[a-m]") | ~charclass.parse("[h-z]")) == ~charclass.parse("[h-m]")
+	assert (~charclass.parse("[a-m]") & ~charclass.parse("[h-z]")) == ~az
+	assert (~az | charclass.parse("[b-c]")) == ~charclass("adefghijklmnopqrstuvwxyz")
+	assert (wide & ~wide).empty()
+	assert str(charclass.parse("[a-df-hj]")) == "[a-dfghj]"
+	assert str(charclass.parse("[abcdfg]")) == "[a-dfg]"
+	assert az.chars == frozenset("abcdefghijklmnopqrstuvwxyz")
+
+	# to_fsm() tests the alphabet against the ranges instead of expanding them
+	notwide = (~wide).to_fsm({"a", "\U00010000", fsm.anything_else})
+	assert notwide.accepts("\U00010000")
+	assert not notwide.accepts("a")
+	assert "_chars" not in wide.__dict__
+
+	# Nor do alphabets built from charclasses elsewhere
+	mid = charclass.parse("[Ā-ǿ]")
+	assert len(mid.alphabet()) == 0x101
+	assert parse("x[Ā-ǿ]").to_sfsm().to_fsm().accepts("xŁ")
+	assert "_chars" not in mid.__dict__
+
+def test_derivatives():
+	abc = parse("a(b|c)*")
+	assert abc.nullable() == False
+	assert abc.derive("a") == parse("(b|c)*")
+	assert abc.derive("b") == pattern()
+	assert parse("[^a]").derive(fsm.anything_else) == pattern(emptystring)
+	assert parse("(ab){2,3}").derive("a") == parse("b(ab){1,2}")
+
+	# Derivatives equal up to reordering and repetition of alternatives are
+	# the same piece, so the DFA needs only as many states as distinct languages
+	for string in [
+		"(a|ab)*",
+		"(b*ab)*",
+		"(ab|ac){2,3}",
+		"a{3,7}b*|c+d{2}",
+		"[^ab]*(a|bc?){0,3}",
+		"[0-9]+(\\.[0-9]+)?(e[+-]?[0-9]+)?",
+	]:
+		piece = parse(string)
+		dfa = piece.to_dfa()
+		assert dfa.equivalent(piece.to_fsm())
+		assert len(dfa.states) == len(dfa.reduce().states)
+
+def test_to_nfa():
+	for string in ["(ab|ac){2,3}", "(a|ab)*", "[^ab]*(a|bc?){0,3}", "(a|b)*a(a|b){5}"]:
+		piece = parse(string)
+		assert piece.to_nfa().to_fsm().equivalent(piece.to_fsm())
+	assert parse("[^ab]c").to_nfa().accepts("xc")
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+'''
+	Approximate matching, by edit distance.
+
+	A Levenshtein automaton for a word and a distance k accepts exactly the
+	strings within k insertions, deletions and substitutions of the word.
+	Following Schulz and Mihov, each of its states is a set of positions
+	(i, e), meaning "the first i characters of the word have been used up,
+	at a cost of e edits", from which any position subsumed by a cheaper one
+	is dropped. There are only O(len(word) * k) such states, and they can be
+	computed on demand.
+
+	To find out whether an FSM accepts some string near a word, there is no
+	need to build either the whole Levenshtein automaton or the whole product
+	of the two: the product is explored from its initial state, one pair of
+	states at a time, so the work done is proportional to the part of it
+	which is actually reachable, and dead ends of the FSM are never entered.
+'''
+
+from greenery import fsm
+
+class levenshtein:
+	'''
+		The Levenshtein automaton accepting every string within edit distance
+		`k` of `word`. States are frozensets of (i, e) positions; the empty
+		frozenset is the dead state.
+	'''
+	def __setattr__(self, name, value):
+		'''Immutability prevents some potential problems.'''
+		raise Exception("This object is immutable.")
+
+	def __init__(self, word, k):
+		if k < 0:
+			raise Exception("Edit distance can't be negative: " + repr(k))
+		self.__dict__["word"] = word
+		self.__dict__["k"] = k
+		self.__dict__["initial"] = frozenset([(0, 0)])
+
+	def _normalise(self, positions):
+		'''
+			Drop every position subsumed by another: (i, e) subsumes (j, f) if
+			e < f and |i - j| <= f - e, since anything reachable from (j, f) is
+			reachable from (i, e) at no greater cost. This only holds because
+			deleting characters of the word is left to `step()`, which looks
+			ahead for the character it was given.
+		'''
+		return frozenset(
+			(j, f)
+			for (j, f) in positions
+			if not any(e < f and abs(i - j) <= f - e for (i, e) in positions)
+		)
+
+	def step(self, state, char):
+		'''
+			Return the state reached from `state` on `char`, which may be
+			`fsm.anything_else`, standing for a character not in the word.
+		'''
+		(word, n, k) = (self.word, len(self.word), self.k)
+		next = set()
+		for (i, e) in state:
+			if e < k:
+				# Insert the character, or substitute it
+				next.add((i, e + 1))
+				if i < n:
+					next.add((i + 1, e + 1))
+			# Match the character, having deleted d characters of the word
+			for d in range(min(k - e, n - i - 1) + 1):
+				if word[i + d] == char:
+					next.add((i + d + 1, e + d))
+					break
+		return self._normalise(next)
+
+	def distance(self, state):
+		'''
+			Return the edit distance between the word and the input read to
+			reach `state`, or None if it exceeds `k`. The rest of the word may
+			still have to be deleted.
+		'''
+		n = len(self.word)
+		costs = [e + n - i for (i, e) in state if e + n - i <= self.k]
+		return min(costs) if len(costs) > 0 else None
+
+	def final(self, state):
+		return self.distance(state) is not None
+
+	def accepts(self, input):
+		state = self.initial
+		for char in input:
+			state = self.step(state, char)
+			if len(state) == 0:
+				return False
+		return self.final(state)
+
+	def __contains__(self, string):
+		return self.accepts(string)
+
+	def to_fsm(self, alphabet=None):
+		'''Build the whole Levenshtein automaton as an `fsm`.'''
+		if alphabet is None:
+			alphabet = set(self.word) | {fsm.anything_else}
+
+		def follow(state, symbol):
+			next = self.step(state, symbol)
+			if len(next) == 0:
+				raise fsm.OblivionError
+			return next
+
+		return fsm.crawl(alphabet, self.initial, self.final, follow)
+
+def approximate(machine, word, k):
+	'''
+		Test whether `machine` (an FSM or lego piece) accepts any string within
+		edit distance `k` of `word`.
+	'''
+	return closest(machine, word, k) is not None
+
+def closest(machine, word, k):
+	'''
+		Return (string, distance) for a string accepted by `machine` (an FSM or
+		lego piece) which is as close as possible to `word`, and no further
+		than `k` edits away, or None if there isn't one. Of the closest strings,
+		a shortest one is returned.
+		Each distance from 0 up to `k` is tried in turn, so a near match is
+		found without exploring the larger product which a larger distance
+		allows.
+	'''
+	if hasattr(machine, "to_fsm"):
+		machine = machine.to_fsm()
+	live = machine.live()
+	if machine.initial not in live:
+		return None
+
+	# Each transition of the product is a symbol of the FSM, which is fed to
+	# the FSM, and a character, which is fed to the automaton and goes into
+	# the string found. A symbol of the alphabet stands for itself; but
+	# `anything_else` stands both for the characters of the word which aren't
+	# in the alphabet, and for some other character which is in neither
+	symbols = [
+		(symbol, symbol)
+		for symbol in sorted(machine.alphabet, key=fsm.key)
+		if symbol is not fsm.anything_else
+	]
+	if fsm.anything_else in machine.alphabet:
+		symbols.extend(
+			(fsm.anything_else, char)
+			for char in sorted(set(word) - machine.alphabet)
+		)
+		symbols.append((fsm.anything_else, _unused(machine.alphabet | set(word))))
+
+	for distance in range(k + 1):
+		found = _search(machine, live, levenshtein(word, distance), symbols)
+		if found is not None:
+			return found
+	return None
+
+def _search(machine, live, automaton, symbols):
+	'''
+		Breadth-first search of the product of `machine` and `automaton` for a
+		pair of final states. Return (string, distance) or None.
+	'''
+	start = (machine.initial, automaton.initial)
+	parents = {start: None}
+	steps = {}
+	queue = [start]
+	i = 0
+	while i < len(queue):
+		(state, lstate) = current = queue[i]
+		i += 1
+		if state in machine.finals and automaton.final(lstate):
+			chars = []
+			while parents[current] is not None:
+				(current, char) = parents[current]
+				chars.append(char)
+			return ("".join(reversed(chars)), automaton.distance(lstate))
+		transitions = machine.map.get(state, {})
+		for (symbol, char) in symbols:
+			if symbol not in transitions or transitions[symbol] not in live:
+				continue
+			# Many pairs share a state of the automaton
+			if (lstate, char) not in steps:
+				steps[(lstate, char)] = automaton.step(lstate, char)
+			lnext = steps[(lstate, char)]
+			if len(lnext) == 0:
+				continue
+			next = (transitions[symbol], lnext)
+			if next not in parents:
+				parents[next] = (current, char)
+				queue.append(next)
+	return None
+
+def _unused(chars):
+	'''Return some printable character which isn't in `chars`.'''
+	i = ord("a")
+	while chr(i) in chars:
+		i += 1
+	return chr(i)
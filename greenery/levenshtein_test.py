@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+	raise Exception("Test files can't be run directly. Use `python -m pytest greenery`")
+
+import itertools
+from greenery.lego import parse
+from greenery.levenshtein import levenshtein, approximate, closest
+
+def _distance(a, b):
+	row = list(range(len(b) + 1))
+	for (i, x) in enumerate(a):
+		previous = row
+		row = [i + 1]
+		for (j, y) in enumerate(b):
+			row.append(min(previous[j + 1] + 1, row[j] + 1, previous[j] + (x != y)))
+	return row[-1]
+
+def test_levenshtein():
+	for (word, k) in [("abc", 1), ("abca", 2), ("", 1)]:
+		automaton = levenshtein(word, k)
+		dfa = automaton.to_fsm()
+		for n in range(6):
+			for chars in itertools.product("abcd", repeat=n):
+				expected = _distance(word, chars) <= k
+				assert automaton.accepts(chars) == expected
+				assert dfa.accepts(chars) == expected
+
+def test_closest():
+	names = parse("(get|set)_(name|value)s?")
+	assert closest(names, "get_name", 2) == ("get_name", 0)
+	assert closest(names, "gte_nme", 2) is None
+	assert closest(names, "gte_nme", 3) == ("get_name", 3)
+	assert closest(names, "set_valu", 2) == ("set_value", 1)
+	assert approximate(names, "sett_names", 1)
+	assert not approximate(names, "put_name", 0)
+
+def test_closest_anything_else():
+	# "z" and "é" are only in the FSM's alphabet as `anything_else`
+	assert closest(parse("x[^y]x"), "xzx", 1) == ("xzx", 0)
+	assert closest(parse("x[^y]x"), "xéx", 0) == ("xéx", 0)
+	assert closest(parse("x[^y]x"), "xyx", 1)[1] == 1
+	assert closest(parse("a[]"), "a", 3) is None
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+'''
+	Maximal-munch lexers.
+
+	A lexer is an ordered list of token rules, each a name and a pattern. At
+	each position, the longest token which any rule matches is taken, and if
+	several rules match that same longest token, the first of them wins.
+
+	All the rules are compiled into one `multidfa`, each of whose states is
+	tagged with only the first rule accepting there, which lets more states be
+	merged. Tokenizing is then a single left-to-right pass: the DFA is run from
+	the start of a token until it dies, remembering the last point at which it
+	accepted, and the next token starts there. No character before that point
+	is ever read twice.
+'''
+
+from greenery import fsm, lego, multidfa
+
+class lexer:
+	'''
+		`rules` is a list of (name, pattern) pairs, in priority order, where each
+		pattern is a lego piece or a regular expression string. Tokens are
+		yielded as (name, text, position) tuples.
+	'''
+	def __setattr__(self, name, value):
+		'''Immutability prevents some potential problems.'''
+		raise Exception("This object is immutable.")
+
+	def __init__(self, rules):
+		names = [name for (name, pattern) in rules]
+		patterns = [
+			pattern if hasattr(pattern, "to_fsm") else lego.parse(pattern)
+			for (name, pattern) in rules
+		]
+		multi = multidfa.from_patterns(patterns)
+		prioritised = multidfa.multidfa(
+			alphabet = multi.alphabet,
+			states   = multi.states,
+			initial  = multi.initial,
+			tags     = dict((state, {min(tag)}) for (state, tag) in multi.tags.items()),
+			map      = multi.map,
+		).reduce()
+
+		self.__dict__["names"] = names
+		self.__dict__["dfa"] = prioritised
+		# The name of the winning rule at each accepting state
+		self.__dict__["accepting"] = dict(
+			(state, names[min(tag)])
+			for (state, tag) in prioritised.tags.items()
+		)
+
+	def tokens(self, string):
+		'''Tokenize a string.'''
+		return self.stream([string])
+
+	def stream(self, chunks):
+		'''
+			Tokenize a stream, supplied as an iterable of strings. Only the text
+			from the start of the current token onwards is kept, and a token may
+			span several chunks. An exception is raised at any position where no
+			rule matches a non-empty token.
+		'''
+		alphabet = self.dfa.alphabet
+		fallback = fsm.anything_else in alphabet
+		map = self.dfa.map
+		accepting = self.accepting
+		initial = self.dfa.initial
+
+		chunks = iter(chunks)
+		exhausted = False
+		buffer = ""
+		offset = 0
+		start = 0
+		while True:
+			state = initial
+			i = start
+			name = None
+			while True:
+				if i == len(buffer):
+					if exhausted:
+						break
+					chunk = next(chunks, None)
+					if chunk is None:
+						exhausted = True
+						break
+					# Drop everything before the current token
+					buffer = buffer[start:] + chunk
+					offset += start
+					i -= start
+					if name is not None:
+						end -= start
+					start = 0
+					continue
+				symbol = buffer[i]
+				if fallback and symbol not in alphabet:
+					symbol = fsm.anything_else
+				transitions = map.get(state)
+				if transitions is None or symbol not in transitions:
+					break
+				state = transitions[symbol]
+				i += 1
+				if state in accepting:
+					(name, end) = (accepting[state], i)
+
+			if name is None:
+				if exhausted and start == len(buffer):
+					return
+				raise Exception("No token matches at position " + repr(offset + start))
+			yield (name, buffer[start:end], offset + start)
+			start = end
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+	raise Exception("Test files can't be run directly. Use `python -m pytest greenery`")
+
+from greenery.lexer import lexer
+
+rules = [
+	("if", "if"),
+	("name", "[a-z]+"),
+	("number", "[0-9]+(\\.[0-9]+)?"),
+	("op", "=|==|<=|<"),
+	("space", " +"),
+]
+
+def test_tokens():
+	assert list(lexer(rules).tokens("if iffy==1.5")) == [
+		("if", "if", 0),
+		("space", " ", 2),
+		("name", "iffy", 3),
+		("op", "==", 7),
+		("number", "1.5", 9),
+	]
+
+def test_backtrack_to_last_accept():
+	# "1." isn't a number, so the longest token is "1", and "." then fails
+	try:
+		list(lexer(rules).tokens("1.x"))
+		assert False
+	except Exception as e:
+		assert str(e) == "No token matches at position 1"
+
+def test_stream():
+	tokens = list(lexer(rules).stream(["if x<", "=12", ".", "5 ", "y"]))
+	assert tokens == [
+		("if", "if", 0),
+		("space", " ", 2),
+		("name", "x", 3),
+		("op", "<=", 4),
+		("number", "12.5", 6),
+		("space", " ", 10),
+		("name", "y", 11),
+	]
+	assert list(lexer(rules).stream([])) == []
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+
+'''
+	Find matches of a lego piece inside a longer string, with POSIX
+	leftmost-longest semantics and no backtracking.
+
+	Two DFAs are built. The forward DFA is the pattern itself. The backward DFA
+	accepts the reverse of every string which *begins* with a match, i.e. it is
+	".*" followed by the reversed pattern. A single right-to-left pass of the
+	backward DFA over the text marks every position at which a match can
+	start. The leftmost such position is the start of the match, and the
+	forward DFA, run from there for as long as it stays alive, finds the
+	longest match from it.
+
+	Both DFAs are "accelerated". A state which loops back to itself on every
+	character but a few (like the body of ".*foo.*", or the initial state of
+	the backward DFA) is crossed using `str.find()` or `str.rfind()` on those
+	few characters, which runs in C, instead of one character at a time. If
+	there are more than a few, the text is first `str.translate()`d, once per
+	state, so that they all become the same character, which is then found.
+	A final state which loops on everything ends the scan at once, since
+	everything after it matches, and so does a state from which no final state
+	can be reached, since nothing after it can.
+
+	Before any of that, a prefilter (see `prefilter`) rejects text which lacks
+	the literals any match would need.
+'''
+
+from greenery import fsm, lego, prefilter
+
+# Accelerating a state costs one find() per escaping character. Beyond this
+# many, one translate() of the whole text, followed by one find(), is cheaper
+ESCAPES = 3
+
+class matcher:
+	'''
+		Compile a lego piece (or a regular expression string) for searching.
+		Spans are returned as (start, end) tuples, like `re.Match.span()`.
+	'''
+	def __setattr__(self, name, value):
+		'''Immutability prevents some potential problems.'''
+		raise Exception("This object is immutable.")
+
+	def __init__(self, pattern):
+		if not hasattr(pattern, "to_fsm"):
+			pattern = lego.parse(pattern)
+		alphabet = pattern.alphabet()
+		forward = pattern.to_fsm(alphabet)
+
+		anything = fsm.fsm(
+			alphabet = alphabet,
+			states   = {0},
+			initial  = 0,
+			finals   = {0},
+			map      = {0: dict((symbol, 0) for symbol in alphabet)},
+		)
+		backward = anything + forward.reversed()
+
+		self.__dict__["pattern"] = pattern
+		self.__dict__["alphabet"] = alphabet
+		self.__dict__["forward"] = forward
+		self.__dict__["backward"] = backward
+		self.__dict__["forwardstates"] = _analyse(forward)
+		self.__dict__["backwardstates"] = _analyse(backward)
+		self.__dict__["prefilter"] = prefilter.prefilter(pattern)
+
+	def _symbol(self, char):
+		if char in self.alphabet:
+			return char
+		return fsm.anything_else
+
+	def accepts(self, string):
+		'''
+			Test whether the whole of `string` matches, like `fsm.accepts()` but
+			with acceleration.
+		'''
+		if not self.prefilter(string):
+			return False
+		forward = self.forward
+		(escapes, universal, dead) = self.forwardstates
+		translated = {}
+		map = forward.map
+		state = forward.initial
+		i = 0
+		end = len(string)
+		while i < end:
+			if state in universal:
+				return True
+			if state in dead:
+				return False
+			if state in escapes:
+				i = _skip(string, i, end, state, escapes, translated)
+				if i == end:
+					break
+			state = map[state].get(self._symbol(string[i])) if state in map else None
+			if state is None:
+				return False
+			i += 1
+		return state in forward.finals
+
+	def __contains__(self, string):
+		return self.accepts(string)
+
+	def starts(self, string, pos=0, endpos=None):
+		'''
+			Return a list of booleans, one for each index from `pos` to `endpos`
+			inclusive, saying whether a match can start there. One backward pass.
+		'''
+		if endpos is None:
+			endpos = len(string)
+		backward = self.backward
+		(escapes, universal, dead) = self.backwardstates
+		translated = {}
+		map = backward.map
+		state = backward.initial
+		starts = [False] * (endpos - pos + 1)
+		starts[endpos - pos] = state in backward.finals
+
+		# `i` is the index after the next character to read
+		i = endpos
+		while i > pos:
+			if state in universal:
+				starts[0:i - pos] = [True] * (i - pos)
+				break
+			if state in dead:
+				break
+			if state in escapes:
+				# Every index skipped over stays in this state
+				j = _rskip(string, pos, i, state, escapes, translated)
+				if state in backward.finals:
+					starts[j - pos:i - pos] = [True] * (i - j)
+				i = j
+				if i == pos:
+					break
+			state = map[state].get(self._symbol(string[i - 1])) if state in map else None
+			if state is None:
+				# Only possible if the pattern can match nothing at all
+				break
+			i -= 1
+			starts[i - pos] = state in backward.finals
+		return starts
+
+	def _longest(self, string, start, endpos, translated):
+		'''
+			Run the forward DFA from `start` until it dies, returning the end of
+			the longest match, or None if there isn't one. `translated` caches
+			translations of `string` between calls.
+		'''
+		forward = self.forward
+		(escapes, universal, dead) = self.forwardstates
+		map = forward.map
+		state = forward.initial
+		end = start if state in forward.finals else None
+		i = start
+		while i < endpos:
+			if state in universal:
+				return endpos
+			if state in dead:
+				break
+			if state in escapes:
+				j = _skip(string, i, endpos, state, escapes, translated)
+				if j > i and state in forward.finals:
+					end = j
+				i = j
+				if i == endpos:
+					break
+			state = map[state].get(self._symbol(string[i])) if state in map else None
+			if state is None:
+				break
+			i += 1
+			if state in forward.finals:
+				end = i
+		return end
+
+	def search(self, string, pos=0, endpos=None):
+		'''
+			Return the span of the leftmost-longest match in `string[pos:endpos]`,
+			or None.
+		'''
+		if endpos is None:
+			endpos = len(string)
+		if not self._possible(string, pos, endpos):
+			return None
+		starts = self.starts(string, pos, endpos)
+		for (i, start) in enumerate(starts):
+			if start:
+				return (pos + i, self._longest(string, pos + i, endpos, {}))
+		return None
+
+	def finditer(self, string, pos=0, endpos=None):
+		'''
+			Generate the spans of successive non-overlapping leftmost-longest
+			matches. As with `re.finditer()`, an empty match is never followed
+			by another at the same index.
+		'''
+		if endpos is None:
+			endpos = len(string)
+		if not self._possible(string, pos, endpos):
+			return
+		# A position's startability depends only on the text after it, so one
+		# backward pass serves for every match
+		starts = self.starts(string, pos, endpos)
+		translated = {}
+		i = pos
+		while i <= endpos:
+			if not starts[i - pos]:
+				i += 1
+				continue
+			end = self._longest(string, i, endpos, translated)
+			yield (i, end)
+			i = end if end > i else i + 1
+
+	def _possible(self, string, pos, endpos):
+		'''Run the prefilter over `string[pos:endpos]`.'''
+		if pos != 0 or endpos != len(string):
+			string = string[pos:endpos]
+		return self.prefilter(string)
+
+	def findall(self, string, pos=0, endpos=None):
+		'''Return the matched substrings, as `re.findall()` does.'''
+		return [string[start:end] for (start, end) in self.finditer(string, pos, endpos)]
+
+def _analyse(machine):
+	'''
+		Classify the states of a DFA for acceleration. Return a dict from each
+		state which loops on `anything_else` to the characters which leave it,
+		the set of final states which loop on every symbol, and the set of
+		states from which no final state can be reached.
+	'''
+	escapes = {}
+	universal = set()
+	for state in machine.states:
+		transitions = machine.map.get(state, {})
+		if transitions.get(fsm.anything_else) != state:
+			continue
+		leaving = [
+			symbol
+			for symbol in machine.alphabet
+			if transitions.get(symbol) != state
+		]
+		if len(leaving) == 0 and state in machine.finals:
+			universal.add(state)
+		elif len(leaving) > 0:
+			escapes[state] = leaving
+
+	return (escapes, universal, machine.states - machine.live())
+
+def _translate(string, state, escapes, translated):
+	'''
+		Return `string` with every character escaping `state` replaced by the
+		first of them, so that a single find() locates any of them. Only
+		characters which escape are changed, so nothing else can be found.
+	'''
+	if state not in translated:
+		chars = escapes[state]
+		translated[state] = string.translate(dict((ord(char), chars[0]) for char in chars))
+	return translated[state]
+
+def _skip(string, i, end, state, escapes, translated):
+	'''
+		Return the index of the first character in `string[i:end]` which escapes
+		`state`, or `end` if there are none.
+	'''
+	chars = escapes[state]
+	if len(chars) > ESCAPES:
+		(string, chars) = (_translate(string, state, escapes, translated), chars[:1])
+	for char in chars:
+		j = string.find(char, i, end)
+		if j != -1:
+			end = j
+	return end
+
+def _rskip(string, start, i, state, escapes, translated):
+	'''
+		Return the index after the last character in `string[start:i]` which
+		escapes `state`, or `start` if there are none.
+	'''
+	chars = escapes[state]
+	if len(chars) > ESCAPES:
+		(string, chars) = (_translate(string, state, escapes, translated), chars[:1])
+	for char in chars:
+		j = string.rfind(char, start, i)
+		if j != -1:
+			start = j + 1
+	return start
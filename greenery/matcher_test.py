@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+	raise Exception("Test files can't be run directly. Use `python -m pytest greenery`")
+
+from greenery.lego import parse
+from greenery.matcher import matcher
+
+def test_search():
+	m = matcher("a+b?")
+	assert m.search("xxaab") == (2, 5)
+	assert m.search("xxaab", 3) == (3, 5)
+	assert m.search("xxaab", 0, 3) == (2, 3)
+	assert m.search("xyz") is None
+	assert m.starts("xab") == [False, True, False, False]
+
+	# Leftmost, then longest, regardless of the order of alternatives
+	assert matcher("(a|ab)(c|bcd)").search("zabcd") == (1, 5)
+	assert matcher(parse("[^a]c")).search("acbc") == (2, 4)
+	assert matcher("b*").search("abb") == (0, 0)
+
+def test_finditer():
+	m = matcher("a+b?")
+	assert list(m.finditer("aab xab b a")) == [(0, 3), (5, 7), (10, 11)]
+	assert m.findall("aab xab b a") == ["aab", "ab", "a"]
+
+	# Empty matches are handled as re.finditer() does
+	assert list(matcher("x*").finditer("axxb")) == [(0, 0), (1, 3), (3, 3), (4, 4)]
+
+	number = matcher("[0-9]+(\\.[0-9]+)?")
+	text = "x" * 10000 + " 3.14 and 42 " + "y" * 10000
+	assert number.findall(text) == ["3.14", "42"]
+
+def test_acceleration():
+	m = matcher(".*foo.*")
+	(escapes, universal, dead) = m.forwardstates
+	assert escapes[m.forward.initial] == ["f"]
+	assert len(universal) == 1
+	assert len(dead) == 0
+	text = "x" * 100000 + "foo" + "y" * 100000
+	assert m.accepts(text)
+	assert not m.accepts(text.replace("foo", "fo"))
+	assert text in m
+
+	# More escaping characters than find() is used for: translate() instead
+	number = matcher("[0-9]+(\\.[0-9]+)?")
+	assert len(number.backwardstates[0][number.backward.initial]) == 10
+	assert number.search("x" * 100000 + " 3.14 " + "y" * 100000) == (100001, 100005)
+	assert number.findall("1a22b333") == ["1", "22", "333"]
+
+	# A state from which nothing can match stops the scan
+	assert not matcher("a[]").accepts("a" * 1000)
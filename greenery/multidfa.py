@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+'''
+	One DFA for many patterns, which reports every pattern that matched.
+
+	Calling `accepts()` on each of N FSMs reads every string N times. The
+	product of the N FSMs, crawled the same way as `fsm.parallel()` does,
+	reads it once; but instead of collapsing the finality of each of its states
+	to a single boolean, each state is tagged with the set of patterns which
+	accept there.
+
+	`fsm.reduce()` can't minimise such a DFA, since it only knows final and
+	non-final states, and would merge states with different tags. Instead, the
+	states are partitioned by tag, and the partition refined until every block
+	agrees on where each symbol leads.
+'''
+
+from greenery import fsm
+
+class multidfa:
+	'''
+		A DFA whose states are tagged. `tags` maps each state to the frozenset of
+		indices of the patterns accepted there; untagged states may be left out.
+		As with `fsm`, `map` may be sparse, omitted transitions leading to a
+		dead state.
+	'''
+	def __setattr__(self, name, value):
+		'''Immutability prevents some potential problems.'''
+		raise Exception("This object is immutable.")
+
+	def __init__(self, alphabet, states, initial, tags, map):
+		if not initial in states:
+			raise Exception("Initial state " + repr(initial) + " must be one of " + repr(states))
+		for state in tags:
+			if not state in states:
+				raise Exception("Tagged state " + repr(state) + " must be one of " + repr(states))
+		self.__dict__["alphabet"] = set(alphabet)
+		self.__dict__["states"] = set(states)
+		self.__dict__["initial"] = initial
+		self.__dict__["tags"] = dict(
+			(state, frozenset(tag))
+			for (state, tag) in tags.items()
+			if len(tag) > 0
+		)
+		self.__dict__["map"] = map
+
+	def matches(self, input):
+		'''
+			Return the frozenset of indices of the patterns which accept the
+			supplied string, in a single pass.
+		'''
+		alphabet = self.alphabet
+		fallback = fsm.anything_else in alphabet
+		map = self.map
+		state = self.initial
+		for symbol in input:
+			if fallback and symbol not in alphabet:
+				symbol = fsm.anything_else
+			if not (state in map and symbol in map[state]):
+				return frozenset()
+			state = map[state][symbol]
+		return self.tags.get(state, frozenset())
+
+	def accepts(self, input):
+		'''Test whether any of the patterns accepts the supplied string.'''
+		return len(self.matches(input)) > 0
+
+	def __contains__(self, string):
+		return self.accepts(string)
+
+	def reduce(self):
+		'''
+			Return the minimal DFA with the same tags, by partition refinement
+			(Moore's algorithm). States start out grouped by tag; each round
+			splits any group whose states disagree on which group some symbol
+			leads to, until no group splits.
+		'''
+		symbols = sorted(self.alphabet, key=fsm.key)
+		states = sorted(self.states, key=repr)
+		tags = self.tags
+		map = self.map
+		none = frozenset()
+
+		blocks = {}
+		block = dict(
+			(state, blocks.setdefault(tags.get(state, none), len(blocks)))
+			for state in states
+		)
+		count = len(blocks)
+		while True:
+			signatures = {}
+			refined = {}
+			for state in states:
+				transitions = map.get(state, {})
+				signature = (block[state],) + tuple(
+					block[transitions[symbol]] if symbol in transitions else -1
+					for symbol in symbols
+				)
+				refined[state] = signatures.setdefault(signature, len(signatures))
+			block = refined
+			if len(signatures) == count:
+				break
+			count = len(signatures)
+
+		newmap = {}
+		newtags = {}
+		for state in states:
+			b = block[state]
+			if b in newmap:
+				continue
+			newmap[b] = dict(
+				(symbol, block[next])
+				for (symbol, next) in map.get(state, {}).items()
+			)
+			if state in tags:
+				newtags[b] = tags[state]
+
+		return multidfa(
+			alphabet = self.alphabet,
+			states   = set(newmap.keys()),
+			initial  = block[self.initial],
+			tags     = newtags,
+			map      = newmap,
+		)
+
+	def to_fsm(self, i):
+		'''Return an FSM accepting exactly the strings pattern `i` accepts.'''
+		return fsm.fsm(
+			alphabet = self.alphabet,
+			states   = self.states,
+			initial  = self.initial,
+			finals   = set(state for state in self.tags if i in self.tags[state]),
+			map      = self.map,
+		).reduce()
+
+def from_patterns(patterns):
+	'''
+		Build a reduced `multidfa` from a list of lego pieces and/or FSMs,
+		whose indices are the tags.
+	'''
+	alphabet = {fsm.anything_else}
+	for pattern in patterns:
+		alphabet |= pattern.alphabet() if hasattr(pattern, "to_fsm") else pattern.alphabet
+	fsms = [
+		pattern.to_fsm(alphabet) if hasattr(pattern, "to_fsm") else pattern
+		for pattern in patterns
+	]
+
+	# A state from which a pattern can no longer accept is dropped from the
+	# product, so that a product state only remains while some pattern could
+	# still match
+	lives = [machine.live() for machine in fsms]
+
+	def substate(i, state):
+		return state if state in lives[i] else None
+
+	initial = tuple(substate(i, machine.initial) for (i, machine) in enumerate(fsms))
+
+	def follow(current, symbol):
+		next = []
+		for (i, machine) in enumerate(fsms):
+			state = current[i]
+			if symbol not in machine.alphabet and fsm.anything_else in machine.alphabet:
+				local = fsm.anything_else
+			else:
+				local = symbol
+			if state is not None and state in machine.map and local in machine.map[state]:
+				next.append(substate(i, machine.map[state][local]))
+			else:
+				next.append(None)
+		next = tuple(next)
+		if all(state is None for state in next):
+			raise fsm.OblivionError
+		return next
+
+	# `crawl()` decides finality for each state in the order it numbers them,
+	# which is how the tags are recorded against the new state numbers
+	tags = []
+	def final(state):
+		tags.append(frozenset(
+			i
+			for (i, machine) in enumerate(fsms)
+			if state[i] is not None and state[i] in machine.finals
+		))
+		return len(tags[-1]) > 0
+
+	crawled = fsm.crawl(alphabet, initial, final, follow)
+	return multidfa(
+		alphabet = crawled.alphabet,
+		states   = crawled.states,
+		initial  = crawled.initial,
+		tags     = dict(enumerate(tags)),
+		map      = crawled.map,
+	).reduce()
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+	raise Exception("Test files can't be run directly. Use `python -m pytest greenery`")
+
+import itertools
+from greenery.lego import parse
+from greenery.multidfa import from_patterns
+
+def test_matches():
+	patterns = [parse("a+"), parse("[ab]*"), parse("b"), parse("abc")]
+	multi = from_patterns(patterns)
+	assert multi.matches("") == {1}
+	assert multi.matches("aa") == {0, 1}
+	assert multi.matches("b") == {1, 2}
+	assert multi.matches("abc") == {3}
+	assert multi.matches("c") == frozenset()
+	assert "abc" in multi
+	assert not multi.accepts("ca")
+
+def test_matches_agree():
+	strings = ["a*b", "(ab)+", "a|b|c", "[^a]a", "c{2,3}", "(a|b)*c"]
+	patterns = [parse(string) for string in strings]
+	fsms = [pattern.to_fsm() for pattern in patterns]
+	# FSMs and lego pieces may be mixed
+	multi = from_patterns(patterns[:3] + fsms[3:])
+	for n in range(5):
+		for chars in itertools.product("abcd", repeat=n):
+			expected = set(i for (i, f) in enumerate(fsms) if f.accepts(chars))
+			assert multi.matches(chars) == expected
+
+def test_reduce_preserves_tags():
+	# After "ab" and "cb" the product is in equivalent states, except that
+	# pattern 2 also accepts after "ab": their tags must keep them apart
+	multi = from_patterns([parse("ab"), parse("cb"), parse("a|ab")])
+	assert multi.matches("ab") == {0, 2}
+	assert multi.matches("cb") == {1}
+	assert multi.matches("a") == {2}
+	assert len(multi.states) == 5
+	assert multi.to_fsm(1).equivalent(parse("cb").to_fsm())
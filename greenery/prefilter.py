@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+'''
+	Required-literal prefilters.
+
+	Most lines of a large corpus can't match an email regex for the simple
+	reason that they don't contain an "@". This module works out, from a lego
+	piece, a boolean formula over literal substrings which every matching
+	string must satisfy, so that most non-matching strings can be rejected
+	with a few `in` tests, which run in C, before any automaton is run.
+
+	A formula is one of:
+	- True, satisfied by every string;
+	- False, satisfied by none;
+	- a string, satisfied by any string containing it;
+	- ("and", formulas) or ("or", formulas).
+
+	The analysis follows RE2's prefilter. For each piece, either the complete
+	set of strings it matches is known ("exact"), if that set is small, or else
+	a formula which its matches must satisfy is. Concatenating exact sets
+	multiplies them out, so "[ab]cd" gives the literals "acd" and "bcd".
+'''
+
+# The most strings an exact set may have before it is turned into a formula
+MAX_EXACT = 16
+
+class prefilter:
+	'''
+		A prefilter for a lego piece. Calling it on a string returns False only
+		if the string (or any substring of it) cannot possibly be matched.
+	'''
+	def __setattr__(self, name, value):
+		'''Immutability prevents some potential problems.'''
+		raise Exception("This object is immutable.")
+
+	def __init__(self, piece):
+		self.__dict__["formula"] = required(piece)
+
+	def __call__(self, string):
+		return evaluate(self.formula, string)
+
+	def literals(self):
+		'''Return the set of literals mentioned by the formula.'''
+		return literals(self.formula)
+
+	def __repr__(self):
+		return "prefilter(" + repr(self.formula) + ")"
+
+def required(piece):
+	'''
+		Return a formula which every string matched by `piece` satisfies.
+	'''
+	(exact, formula) = _info(piece)
+	if exact is not None:
+		return _any(exact)
+	return formula
+
+def evaluate(formula, string):
+	'''Test whether `string` satisfies `formula`.'''
+	if formula is True or formula is False:
+		return formula
+	if not isinstance(formula, tuple):
+		return formula in string
+	(operator, operands) = formula
+	if operator == "and":
+		return all(evaluate(operand, string) for operand in operands)
+	return any(evaluate(operand, string) for operand in operands)
+
+def literals(formula):
+	'''Return the set of literal strings mentioned in `formula`.'''
+	if formula is True or formula is False:
+		return set()
+	if not isinstance(formula, tuple):
+		return {formula}
+	return set().union(*[literals(operand) for operand in formula[1]])
+
+def _info(piece):
+	'''
+		Return (exact, formula) for a lego piece, where `exact` is the set of
+		all strings it matches, or None if that isn't known, in which case
+		`formula` must be satisfied by all of them.
+	'''
+	if hasattr(piece, "ranges"):
+		if piece.negated or sum(last - first + 1 for (first, last) in piece.ranges) > MAX_EXACT:
+			return (None, True)
+		return (set(
+			chr(i)
+			for (first, last) in piece.ranges
+			for i in range(first, last + 1)
+		), None)
+
+	if hasattr(piece, "multiplicand"):
+		(min, max) = (piece.multiplier.min.v, piece.multiplier.max.v)
+		(exact, formula) = _info(piece.multiplicand)
+		if max == 0:
+			return ({""}, None)
+		if exact is not None and min == max:
+			# e.g. "a{3}" is exactly "aaa"
+			product = {""}
+			for i in range(min):
+				product = _product(product, exact)
+				if product is None:
+					break
+			else:
+				return (product, None)
+		if min == 0:
+			return (None, True)
+		# At least one copy must be present
+		return (None, _any(exact) if exact is not None else formula)
+
+	if hasattr(piece, "mults"):
+		# Multiply out runs of exact sets, and require all of the rest
+		conjuncts = []
+		exact = {""}
+		for m in piece.mults:
+			(mexact, mformula) = _info(m)
+			if mexact is None and m.multiplier.min.v > 0:
+				# e.g. "ab+c" contains "ab", since the first "b" follows the "a",
+				# and "bc", since the last "b" precedes the "c"
+				(cexact, cformula) = _info(m.multiplicand)
+				if cexact is not None:
+					product = _product(exact, cexact)
+					conjuncts.append(_any(product if product is not None else exact))
+					exact = cexact
+					continue
+			if mexact is not None:
+				product = _product(exact, mexact)
+				if product is not None:
+					exact = product
+					continue
+				conjuncts.append(_any(exact))
+				exact = mexact
+				continue
+			conjuncts.append(_any(exact))
+			conjuncts.append(mformula)
+			exact = {""}
+		if len(conjuncts) == 0:
+			return (exact, None)
+		conjuncts.append(_any(exact))
+		return (None, _and(conjuncts))
+
+	if hasattr(piece, "concs"):
+		infos = [_info(c) for c in piece.concs]
+		if all(exact is not None for (exact, formula) in infos):
+			union = set().union(*[exact for (exact, formula) in infos])
+			if len(union) <= MAX_EXACT:
+				return (union, None)
+		return (None, _or([
+			_any(exact) if exact is not None else formula
+			for (exact, formula) in infos
+		]))
+
+	# Anchors match no characters at all
+	return ({""}, None)
+
+def _product(a, b):
+	'''Every string from `a` followed by every string from `b`, if few enough.'''
+	if len(a) * len(b) > MAX_EXACT:
+		return None
+	return set(x + y for x in a for y in b)
+
+def _any(exact):
+	'''The formula for "contains one of these strings".'''
+	if "" in exact:
+		return True
+	return _or(sorted(exact))
+
+def _and(formulas):
+	operands = []
+	for formula in formulas:
+		if formula is False:
+			return False
+		if formula is True:
+			continue
+		if isinstance(formula, tuple) and formula[0] == "and":
+			operands.extend(formula[1])
+		elif formula not in operands:
+			operands.append(formula)
+	if len(operands) == 0:
+		return True
+	if len(operands) == 1:
+		return operands[0]
+	return ("and", tuple(operands))
+
+def _or(formulas):
+	operands = []
+	for formula in formulas:
+		if formula is True:
+			return True
+		if formula is False:
+			continue
+		if isinstance(formula, tuple) and formula[0] == "or":
+			operands.extend(formula[1])
+		elif formula not in operands:
+			operands.append(formula)
+	if len(operands) == 0:
+		return False
+	if len(operands) == 1:
+		return operands[0]
+	return ("or", tuple(operands))
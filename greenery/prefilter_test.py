@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+	raise Exception("Test files can't be run directly. Use `python -m pytest greenery`")
+
+import itertools
+from greenery.lego import parse
+from greenery.prefilter import required, prefilter, evaluate
+
+def test_required():
+	assert required(parse("foo")) == "foo"
+	assert required(parse("[ab]cd")) == ("or", ("acd", "bcd"))
+	assert required(parse("(foo|bar)baz")) == ("or", ("barbaz", "foobaz"))
+	assert required(parse("[a-z]+@[a-z]+\\.com")) == ("and", ("@", ".com"))
+	assert required(parse("ab+c")) == ("and", ("ab", "bc"))
+	assert required(parse("a{3}")) == "aaa"
+	assert required(parse("x*")) is True
+	assert required(parse("[^a]")) is True
+	assert required(parse("a[]")) is False
+
+def test_evaluate():
+	formula = ("and", ("@", ("or", (".com", ".org"))))
+	assert evaluate(formula, "bob@example.org")
+	assert not evaluate(formula, "bob@example.net")
+	assert not evaluate(formula, "example.com")
+
+def test_prefilter_sound():
+	# A prefilter may let non-matches through, but must never reject a match
+	for string in ["ab+c", "(ab|cd){2}", "a(b|c*)d", "x(ab){2,}y", "[ab]cd|d+a", "a{2,3}b?c+"]:
+		piece = parse(string)
+		dfa = piece.to_fsm()
+		p = prefilter(piece)
+		for n in range(6):
+			for chars in itertools.product("abcdxy", repeat=n):
+				if dfa.accepts(chars):
+					assert p("".join(chars))
+	assert prefilter(parse("x(ab){2,}y")).literals() == {"xab", "aby"}
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+'''
+	Classify strings against many patterns at once.
+
+	Running thousands of DFAs over every line is slow, and nearly all of them
+	fail. Instead, the required literals of every pattern (see `prefilter`) are
+	gathered into a single Aho-Corasick automaton, which finds all of them in
+	one pass over the line, at a cost which doesn't depend on the number of
+	patterns. Only the patterns whose prefilter formulas are satisfied by the
+	literals found are then run in full.
+'''
+
+from collections import deque
+from greenery import fsm, lego, matcher, prefilter
+
+class ruleset:
+	'''
+		A list of patterns (lego pieces or regular expression strings), which
+		are identified by their indices. Each pattern's `matcher` is only
+		compiled the first time it is needed.
+	'''
+	def __setattr__(self, name, value):
+		'''Immutability prevents some potential problems.'''
+		raise Exception("This object is immutable.")
+
+	def __init__(self, patterns):
+		patterns = [
+			pattern if hasattr(pattern, "to_fsm") else lego.parse(pattern)
+			for pattern in patterns
+		]
+		formulas = [prefilter.required(pattern) for pattern in patterns]
+
+		# Patterns needing no literal are always candidates. Patterns whose
+		# formula is False can never match, so they are never candidates
+		always = []
+		byliteral = {}
+		for (i, formula) in enumerate(formulas):
+			if formula is True:
+				always.append(i)
+			for literal in prefilter.literals(formula):
+				byliteral.setdefault(literal, []).append(i)
+
+		(automaton, outputs) = aho_corasick(byliteral.keys())
+
+		self.__dict__["patterns"] = patterns
+		self.__dict__["formulas"] = formulas
+		self.__dict__["always"] = always
+		self.__dict__["byliteral"] = byliteral
+		self.__dict__["automaton"] = automaton
+		self.__dict__["outputs"] = outputs
+		self.__dict__["matchers"] = {}
+
+	def literals(self, string):
+		'''
+			Return the set of required literals, from any pattern, which occur
+			in `string`. One pass, whatever the number of patterns.
+		'''
+		automaton = self.automaton
+		alphabet = automaton.alphabet
+		map = automaton.map
+		outputs = self.outputs
+		state = automaton.initial
+		found = set()
+		for char in string:
+			if char not in alphabet:
+				char = fsm.anything_else
+			state = map[state][char]
+			if state in outputs:
+				found.update(outputs[state])
+		return found
+
+	def candidates(self, string):
+		'''
+			Return the sorted indices of the patterns which `string` might
+			match: those whose prefilter formula is satisfied by the literals in
+			it. `prefilter.evaluate()` only needs `in` to work, so the set of
+			literals found stands in for the string itself.
+		'''
+		found = self.literals(string)
+		candidates = set(self.always)
+		for literal in found:
+			for i in self.byliteral[literal]:
+				if i not in candidates and prefilter.evaluate(self.formulas[i], found):
+					candidates.add(i)
+		return sorted(candidates)
+
+	def matcher(self, i):
+		if i not in self.matchers:
+			self.matchers[i] = matcher.matcher(self.patterns[i])
+		return self.matchers[i]
+
+	def search(self, string):
+		'''
+			Return the sorted indices of the patterns which match somewhere in
+			`string`.
+		'''
+		return [
+			i
+			for i in self.candidates(string)
+			if self.matcher(i).search(string) is not None
+		]
+
+	def fullmatch(self, string):
+		'''
+			Return the sorted indices of the patterns which match the whole of
+			`string`.
+		'''
+		return [
+			i
+			for i in self.candidates(string)
+			if self.matcher(i).accepts(string)
+		]
+
+def aho_corasick(words):
+	'''
+		Build an Aho-Corasick automaton for a collection of non-empty strings.
+		Return an `fsm`, whose states are the nodes of the trie of the words,
+		with every transition a failure link would have led to filled in,
+		and a dict from states to the words which end there (including those
+		which are suffixes of other words). The FSM's final states are those
+		with words; feeding it any string ends in a final state exactly if the
+		string ends with one of the words.
+	'''
+	words = sorted(set(words))
+	alphabet = {fsm.anything_else}
+	for word in words:
+		alphabet.update(word)
+
+	# The trie: state 0 is the root
+	goto = [{}]
+	outputs = {}
+	for word in words:
+		state = 0
+		for char in word:
+			if char not in goto[state]:
+				goto[state][char] = len(goto)
+				goto.append({})
+			state = goto[state][char]
+		outputs.setdefault(state, set()).add(word)
+
+	# Breadth first, so that each failure link is already complete
+	map = {0: dict((symbol, goto[0].get(symbol, 0)) for symbol in alphabet)}
+	queue = deque((state, 0) for state in goto[0].values())
+	while len(queue) > 0:
+		(state, fail) = queue.popleft()
+		if fail in outputs:
+			outputs.setdefault(state, set()).update(outputs[fail])
+		map[state] = dict(map[fail])
+		for (char, next) in goto[state].items():
+			map[state][char] = next
+			queue.append((next, map[fail][char]))
+
+	automaton = fsm.fsm(
+		alphabet = alphabet,
+		states   = set(range(len(goto))),
+		initial  = 0,
+		finals   = set(outputs.keys()),
+		map      = map,
+	)
+	return (automaton, outputs)
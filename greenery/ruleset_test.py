@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+	raise Exception("Test files can't be run directly. Use `python -m pytest greenery`")
+
+import re
+from greenery.fsm import anything_else
+from greenery.ruleset import ruleset, aho_corasick
+
+def test_aho_corasick():
+	(automaton, outputs) = aho_corasick(["he", "she", "his", "hers"])
+	assert automaton.accepts("ushe")
+	assert automaton.accepts("hers")
+	assert not automaton.accepts("hi")
+	state = automaton.initial
+	for char in "ushe":
+		if char not in automaton.alphabet:
+			char = anything_else
+		state = automaton.map[state][char]
+	assert outputs[state] == {"she", "he"}
+
+def test_ruleset():
+	patterns = ["foo.+", "[a-z]+@[a-z]+\\.com", "ba(r|z)", "x*", "a[]"]
+	rules = ruleset(patterns)
+	assert rules.literals("foo bob@x.com") == {"foo", "@", ".com"}
+	# "x*" needs no literal; "a[]" can never match
+	assert rules.candidates("nothing here") == [3]
+	assert rules.candidates("foo") == [0, 3]
+	assert rules.search("foo") == [3]
+	assert rules.search("bob@example.com or bar") == [1, 2, 3]
+	assert rules.fullmatch("baz") == [2]
+	assert rules.fullmatch("") == [3]
+
+def test_ruleset_agrees_with_re():
+	patterns = ["ab+c", "(ab|cd){2}", "a(b|c*)d", "[ab]cd|d+a", "cab", "b?c+a"]
+	rules = ruleset(patterns)
+	compiled = [re.compile(pattern) for pattern in patterns]
+	for line in ["", "abbbc", "abcd", "xcdcdx", "acccd", "ccccab", "bcda", "dda", "zzz"]:
+		expected = [i for (i, r) in enumerate(compiled) if r.search(line)]
+		assert rules.search(line) == expected
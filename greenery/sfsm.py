@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+
+'''
+	Symbolic finite state machine library.
+
+	An ordinary `fsm` has one transition per symbol of its alphabet, which is
+	fine for ASCII but hopeless for regular expressions over the whole of
+	Unicode. The transitions of a symbolic FSM are instead labelled with
+	predicates: `lego.charclass` objects, which are stored as intervals of
+	code points. Products, determinisation and minimisation work on the
+	"minterms" of those predicates (the coarsest partition of the characters
+	which none of the predicates can tell apart) so their cost depends on the
+	number of distinct ranges involved, not on the size of the alphabet.
+'''
+
+import sys
+from greenery import fsm, lego
+
+class sfsm:
+	'''
+		A deterministic symbolic FSM. `map` takes each state to a list of
+		(predicate, next state) pairs, where each predicate is a non-empty
+		`lego.charclass` and no two predicates leaving the same state overlap.
+		As with `fsm`, any character not covered leads to an implicit,
+		non-final "oblivion" state.
+	'''
+	def __setattr__(self, name, value):
+		'''Immutability prevents some potential problems.'''
+		raise Exception("This object is immutable.")
+
+	def __init__(self, states, initial, finals, map):
+		if not initial in states:
+			raise Exception("Initial state " + repr(initial) + " must be one of " + repr(states))
+		if not finals.issubset(states):
+			raise Exception("Final states " + repr(finals) + " must be a subset of " + repr(states))
+		for state in map.keys():
+			for (predicate, next) in map[state]:
+				if not next in states:
+					raise Exception("Transition for state " + repr(state) + " and predicate " + repr(predicate) + " leads to " + repr(next) + ", which is not a state")
+
+		self.__dict__["states" ] = set(states)
+		self.__dict__["initial"] = initial
+		self.__dict__["finals" ] = set(finals)
+		self.__dict__["map"    ] = map
+
+	def accepts(self, input):
+		'''
+			Test whether the present symbolic FSM accepts the supplied string.
+		'''
+		state = self.initial
+		for char in input:
+			for (predicate, next) in self.map.get(state, ()):
+				if char in predicate:
+					state = next
+					break
+			else:
+				return False
+		return state in self.finals
+
+	def __contains__(self, string):
+		return self.accepts(string)
+
+	def __repr__(self):
+		string = "sfsm("
+		string += "states = " + repr(self.states)
+		string += ", initial = " + repr(self.initial)
+		string += ", finals = " + repr(self.finals)
+		string += ", map = " + repr(self.map)
+		string += ")"
+		return string
+
+	def __str__(self):
+		rows = []
+		for state in sorted(self.states):
+			row = "* " if state == self.initial else "  "
+			row += str(state)
+			if state in self.finals:
+				row += " (final)"
+			row += ":"
+			for (predicate, next) in self.map.get(state, ()):
+				row += " " + str(predicate) + " -> " + str(next) + ";"
+			rows.append(row)
+		return "".join(row + "\n" for row in rows)
+
+	def reduce(self):
+		'''
+			Minimise by double reversal, as `fsm.reduce()` does.
+		'''
+		return self.reversed().reversed()
+
+	def concatenate(*sfsms):
+		'''
+			Concatenate arbitrarily many symbolic FSMs together.
+		'''
+		def close(items):
+			'''Entering a final state of one machine also enters the next one.'''
+			items = set(items)
+			for (i, substate) in list(items):
+				while i < len(sfsms) - 1 and substate in sfsms[i].finals:
+					i += 1
+					substate = sfsms[i].initial
+					items.add((i, substate))
+			return items
+
+		initial = frozenset(close([(0, sfsms[0].initial)]))
+
+		def final(state):
+			for (i, substate) in state:
+				if i == len(sfsms) - 1 and substate in sfsms[i].finals:
+					return True
+			return False
+
+		def follow(state):
+			edges = []
+			for (i, substate) in state:
+				for (predicate, next) in sfsms[i].map.get(substate, ()):
+					for item in close([(i, next)]):
+						edges.append((predicate, item))
+			return edges
+
+		return crawl(initial, final, follow).reduce()
+
+	def __add__(self, other):
+		return self.concatenate(other)
+
+	def star(self):
+		'''
+			Kleene star closure. As with `fsm.star()`, we can't naively connect
+			the final states back to the initial state.
+		'''
+		initial = frozenset([self.initial, None])
+
+		def final(state):
+			return None in state or any(substate in self.finals for substate in state)
+
+		def follow(state):
+			edges = []
+			for substate in state:
+				if substate is None:
+					continue
+				for (predicate, next) in self.map.get(substate, ()):
+					edges.append((predicate, next))
+					# Final state? Then we may go round again
+					if next in self.finals:
+						edges.append((predicate, self.initial))
+			return edges
+
+		return crawl(initial, final, follow).reduce()
+
+	def times(self, multiplier):
+		'''
+			Given a symbolic FSM and an integer multiplier, return the multiplied
+			symbolic FSM.
+		'''
+		if multiplier < 0:
+			raise Exception("Can't multiply an SFSM by " + repr(multiplier))
+		result = epsilon()
+		for i in range(multiplier):
+			result += self
+		return result
+
+	def __mul__(self, multiplier):
+		return self.times(multiplier)
+
+	def union(*sfsms):
+		return parallel(sfsms, any)
+
+	def __or__(self, other):
+		return self.union(other)
+
+	def intersection(*sfsms):
+		return parallel(sfsms, all)
+
+	def __and__(self, other):
+		return self.intersection(other)
+
+	def symmetric_difference(*sfsms):
+		return parallel(sfsms, lambda accepts: (accepts.count(True) % 2) == 1)
+
+	def __xor__(self, other):
+		return self.symmetric_difference(other)
+
+	def difference(*sfsms):
+		return parallel(sfsms, lambda accepts: accepts[0] and not any(accepts[1:]))
+
+	def __sub__(self, other):
+		return self.difference(other)
+
+	def everythingbut(self):
+		'''
+			Return a symbolic FSM accepting every string (over all of Unicode)
+			which the present one doesn't.
+		'''
+		return universal() - self
+
+	def reversed(self):
+		'''
+			Return a symbolic FSM accepting the reverse of every string which the
+			present one accepts.
+		'''
+		incoming = {}
+		for state in self.map:
+			for (predicate, next) in self.map[state]:
+				incoming.setdefault(next, []).append((predicate, state))
+
+		initial = frozenset(self.finals)
+
+		def final(state):
+			return self.initial in state
+
+		def follow(state):
+			edges = []
+			for substate in state:
+				edges.extend(incoming.get(substate, ()))
+			return edges
+
+		return crawl(initial, final, follow)
+		# Do not reduce() the result, since reduce() calls us in turn
+
+	def __reversed__(self):
+		return self.reversed()
+
+	def empty(self):
+		'''
+			True if no final state can be reached from the initial state.
+		'''
+		reachable = [self.initial]
+		seen = {self.initial}
+		while len(reachable) > 0:
+			state = reachable.pop()
+			if state in self.finals:
+				return False
+			for (predicate, next) in self.map.get(state, ()):
+				if next not in seen:
+					seen.add(next)
+					reachable.append(next)
+		return True
+
+	def equivalent(self, other):
+		return (self ^ other).empty()
+
+	def __eq__(self, other):
+		return self.equivalent(other)
+
+	def __ne__(self, other):
+		return not self.equivalent(other)
+
+	def isdisjoint(self, other):
+		return (self & other).empty()
+
+	def issubset(self, other):
+		return (self - other).empty()
+
+	def __le__(self, other):
+		return self.issubset(other)
+
+	def issuperset(self, other):
+		return (other - self).empty()
+
+	def __ge__(self, other):
+		return self.issuperset(other)
+
+	def to_fsm(self, alphabet=None):
+		'''
+			Expand the present symbolic FSM into an ordinary `fsm`. If no alphabet
+			is supplied, every character mentioned explicitly by some predicate is
+			used, plus `fsm.anything_else`, which stands for all the other
+			characters and so is matched by the negated predicates.
+		'''
+		if alphabet is None:
+			alphabet = {fsm.anything_else}
+			for state in self.map:
+				for (predicate, next) in self.map[state]:
+					alphabet |= predicate.alphabet()
+
+		map = {}
+		for state in self.map:
+			map[state] = {}
+			for symbol in alphabet:
+				for (predicate, next) in self.map[state]:
+					if symbol is fsm.anything_else:
+						if predicate.negated:
+							map[state][symbol] = next
+							break
+					elif symbol in predicate:
+						map[state][symbol] = next
+						break
+
+		return fsm.fsm(
+			alphabet = alphabet,
+			states   = self.states,
+			initial  = self.initial,
+			finals   = self.finals,
+			map      = map,
+		)
+
+def null():
+	'''A symbolic FSM accepting nothing, not even the empty string.'''
+	return sfsm(states = {0}, initial = 0, finals = set(), map = {})
+
+def epsilon():
+	'''A symbolic FSM accepting only the empty string.'''
+	return sfsm(states = {0}, initial = 0, finals = {0}, map = {})
+
+def universal():
+	'''A symbolic FSM accepting every string.'''
+	return sfsm(states = {0}, initial = 0, finals = {0}, map = {0: [(lego.dot, 0)]})
+
+def _empty(predicate):
+	'''
+		`charclass.empty()` only recognises "[]"; over all of Unicode, a negated
+		charclass listing every code point is empty too.
+	'''
+	return predicate.empty() or \
+		predicate.negated and predicate.ranges == ((0, sys.maxunicode),)
+
+def minterms(predicates):
+	'''
+		Given a list of charclasses, return the coarsest partition of the
+		characters they cover into (charclass, indices) pairs, where `indices`
+		lists the predicates containing every character of that charclass.
+		Characters covered by none of the predicates are omitted.
+	'''
+	regions = [(lego.dot, ())]
+	for (i, predicate) in enumerate(predicates):
+		refined = []
+		for (region, indices) in regions:
+			inside = region & predicate
+			if not _empty(inside):
+				refined.append((inside, indices + (i,)))
+			outside = region & ~predicate
+			if not _empty(outside):
+				refined.append((outside, indices))
+		regions = refined
+	return [(region, indices) for (region, indices) in regions if len(indices) > 0]
+
+def parallel(sfsms, test):
+	'''
+		Crawl several symbolic FSMs in parallel, as `fsm.parallel()` does.
+	'''
+	initial = frozenset((i, s.initial) for (i, s) in enumerate(sfsms))
+
+	def final(state):
+		accepts = [(i, s.finals) for (i, s) in enumerate(sfsms)]
+		return test([
+			any((i, substate) in state for substate in finals)
+			for (i, finals) in accepts
+		])
+
+	def follow(state):
+		edges = []
+		for (i, substate) in state:
+			for (predicate, next) in sfsms[i].map.get(substate, ()):
+				edges.append((predicate, (i, next)))
+		return edges
+
+	return crawl(initial, final, follow).reduce()
+
+def crawl(initial, final, follow):
+	'''
+		The symbolic counterpart of `fsm.crawl()`. States of the new machine are
+		frozensets of items. `follow(state)` returns a list of (predicate, item)
+		pairs, which may overlap: for each minterm of those predicates, the next
+		state is the set of all items whose predicate covers it. Minterms leading
+		to the same next state are merged back into a single transition.
+	'''
+	states = [initial]
+	index = {initial: 0}
+	finals = set()
+	map = {}
+
+	i = 0
+	while i < len(states):
+		state = states[i]
+		if final(state):
+			finals.add(i)
+
+		edges = follow(state)
+		targets = {}
+		order = []
+		for (region, indices) in minterms([predicate for (predicate, item) in edges]):
+			next = frozenset(edges[k][1] for k in indices)
+			if next not in index:
+				index[next] = len(states)
+				states.append(next)
+			j = index[next]
+			if j in targets:
+				targets[j] |= region
+			else:
+				targets[j] = region
+				order.append(j)
+		map[i] = [(targets[j], j) for j in order]
+
+		i += 1
+
+	return sfsm(
+		states  = range(len(states)),
+		initial = 0,
+		finals  = finals,
+		map     = map,
+	)
+
+def from_lego(piece):
+	'''
+		Compile a lego piece into a symbolic FSM, component by component, in
+		the same way that `lego.to_fsm()` builds an ordinary one.
+	'''
+	if hasattr(piece, "ranges"):
+		if _empty(piece):
+			return null()
+		return sfsm(
+			states  = {0, 1},
+			initial = 0,
+			finals  = {1},
+			map     = {0: [(piece, 1)]},
+		)
+
+	if hasattr(piece, "multiplicand"):
+		unit = from_lego(piece.multiplicand)
+		mandatory = unit * piece.multiplier.mandatory.v
+		if piece.multiplier.optional == lego.inf:
+			optional = unit.star()
+		else:
+			optional = (epsilon() | unit) * piece.multiplier.optional.v
+		return mandatory + optional
+
+	if hasattr(piece, "mults"):
+		return epsilon().concatenate(*[from_lego(m) for m in piece.mults])
+
+	if hasattr(piece, "concs"):
+		return null().union(*[from_lego(c) for c in piece.concs])
+
+	raise Exception("Can't compile " + repr(piece) + " to a symbolic FSM")
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+	raise Exception("Test files can't be run directly. Use `python -m pytest greenery`")
+
+from greenery.lego import parse, charclass
+from greenery.sfsm import sfsm, null, epsilon, universal, minterms
+
+def test_minterms():
+	a = charclass.fromranges([(0x61, 0x7a)])
+	b = charclass.fromranges([(0x6d, 0x10ffff)])
+	regions = dict((indices, region) for (region, indices) in minterms([a, b]))
+	assert regions == {
+		(0,): charclass.fromranges([(0x61, 0x6c)]),
+		(0, 1): charclass.fromranges([(0x6d, 0x7a)]),
+		(1,): charclass.fromranges([(0x7b, 0x10ffff)]),
+	}
+	assert minterms([]) == []
+
+def test_sfsm_accepts():
+	a = parse("[^a]*b").to_sfsm()
+	assert a.accepts("b")
+	assert a.accepts("一\U0001f600b")
+	assert not a.accepts("ab")
+	assert not a.accepts("bc")
+	assert "xb" in a
+
+def test_sfsm_wide_ranges():
+	# Transitions stay range-labelled: nothing is ever expanded per character
+	everything = parse("[\x00-\U0010ffff]*").to_sfsm()
+	assert len(everything.map[everything.initial]) == 1
+	noa = everything - parse(".*a.*").to_sfsm()
+	assert noa == parse("[^a]*").to_sfsm()
+	assert noa.accepts("\U0010ffff")
+	assert not noa.accepts("bab")
+
+	cjk = parse("[一-鿿]+").to_sfsm()
+	letters = parse("[A-退]+").to_sfsm()
+	both = cjk & letters
+	assert both == parse("[一-退]+").to_sfsm()
+	assert len(both.states) == 2
+
+def test_sfsm_operations():
+	ab = parse("ab").to_sfsm()
+	assert (ab | parse("c").to_sfsm()).accepts("c")
+	assert (ab * 3).accepts("ababab")
+	assert not (ab * 3).accepts("abab")
+	assert ab.star().accepts("")
+	assert ab.star().accepts("abab")
+	assert ab.reversed().accepts("ba")
+	assert (ab ^ ab).empty()
+	assert ab.everythingbut().accepts("一")
+	assert not ab.everythingbut().accepts("ab")
+	assert null().empty()
+	assert not epsilon().empty()
+	assert universal().issuperset(ab)
+	assert ab.isdisjoint(parse("a").to_sfsm())
+
+def test_sfsm_to_fsm():
+	for string in ["(ab|ac){2,3}", "[^a]*b", "a*?b+", "[bc]*c", "(a|b)c?"]:
+		piece = parse(string)
+		assert piece.to_sfsm().to_fsm() == piece.to_fsm()
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+'''
+	Submatch extraction for named groups, in one pass, with a tagged DFA.
+
+	An ordinary DFA can say whether a string matches "(?P<y>[0-9]{4})-(?P<m>
+	[0-9]{2})", but not where the groups were. Following Laurikari, the
+	pattern is compiled into an NFA in which the start and end of each named
+	group are "tags": epsilon transitions which record the current position in
+	a register. Running the NFA keeps one thread per NFA state, each with its
+	own registers, in priority order, so that where there is ambiguity, the
+	first thread (e.g. the one which took more iterations of a greedy loop)
+	wins, as it would with backtracking.
+
+	Which threads there are, in what order, and which tags each sets, depends
+	only on the previous list of threads and the character read, and not on
+	the registers. So every step is cached, like a transition of a lazily
+	built DFA (see `lazydfa`): a DFA state is a tuple of NFA states, and each
+	transition carries the register operations to perform, "copy thread j's
+	registers, and set these tags to the current position". A string is then
+	read with one dict lookup per character, plus those operations.
+
+	Since a lego pattern is a set of alternatives, the order in which they were
+	written is lost; ambiguity between alternatives is resolved in an
+	arbitrary, but fixed, order.
+'''
+
+from greenery import lego
+
+# Kinds of NFA node
+CHAR, SPLIT, TAG, MATCH = range(4)
+
+class tdfa:
+	'''
+		Compile a lego piece (or regular expression string) for submatch
+		extraction. `names` lists its named groups. Within a concatenation
+		they come in order of appearance, but the alternatives of a pattern
+		are visited in order of their string forms, since lego doesn't keep
+		the order they were written in; so "(?P<b>b)|(?P<a>a)" lists "a"
+		before "b". Groups should be looked up by name, not by position.
+		At most `limit` DFA states are cached; when there are more, the cache
+		is emptied and rebuilt on demand.
+	'''
+	def __init__(self, piece, limit=10000):
+		if not hasattr(piece, "to_fsm"):
+			piece = lego.parse(piece)
+		if limit < 2:
+			raise Exception("A tagged DFA needs room for at least 2 states, not " + repr(limit))
+		nfa = [(MATCH,)]
+		names = []
+		_names(piece, names)
+		start = _compile(piece, 0, nfa, names)
+		self.nfa = nfa
+		self.names = names
+		self.limit = limit
+		self.initial = _closure(nfa, start, None, set(), [], [])
+		self.cache = {}
+
+	def _step(self, key, char):
+		'''
+			Compute the DFA transition from the threads `key` on `char`. Return
+			the next threads, and for each of them, which thread it came from
+			and the tags it set, or None in place of the latter if the registers
+			are unchanged.
+		'''
+		nfa = self.nfa
+		threads = []
+		operations = []
+		visited = set()
+		for (j, s) in enumerate(key):
+			node = nfa[s]
+			if node[0] == CHAR and char in node[1]:
+				_closure(nfa, node[2], j, visited, threads, operations)
+		# Often, e.g. inside ".*", every thread just carries on with the same
+		# registers, and there is nothing to do
+		unchanged = all(
+			origin == j and len(tags) == 0
+			for (j, (origin, tags)) in enumerate(operations)
+		) and len(operations) == len(key)
+		return (tuple(threads), None if unchanged else tuple(operations))
+
+	def spans(self, string):
+		'''
+			If the whole of `string` matches, return a dict from each group name
+			to its (start, end) span, or None if the group didn't take part.
+			Otherwise, return None.
+		'''
+		(key, operations) = self.initial
+		empty = (None,) * (2 * len(self.names))
+		registers = [_set(empty, tags, 0) for (j, tags) in operations]
+		cache = self.cache
+		for (i, char) in enumerate(string):
+			transitions = cache.get(key)
+			if transitions is None:
+				if len(cache) >= self.limit:
+					cache.clear()
+				transitions = cache[key] = {}
+			transition = transitions.get(char)
+			if transition is None:
+				transition = transitions[char] = self._step(key, char)
+			(key, operations) = transition
+			if len(key) == 0:
+				return None
+			if operations is not None:
+				registers = [_set(registers[j], tags, i + 1) for (j, tags) in operations]
+
+		for (j, s) in enumerate(key):
+			if self.nfa[s][0] == MATCH:
+				result = {}
+				for (k, name) in enumerate(self.names):
+					(start, end) = registers[j][2 * k:2 * k + 2]
+					result[name] = None if start is None or end is None else (start, end)
+				return result
+		return None
+
+	def match(self, string):
+		'''
+			If the whole of `string` matches, return a dict from each group name
+			to the substring it matched (None if the group didn't take part).
+			Otherwise, return None.
+		'''
+		spans = self.spans(string)
+		if spans is None:
+			return None
+		return dict(
+			(name, None if span is None else string[span[0]:span[1]])
+			for (name, span) in spans.items()
+		)
+
+	def accepts(self, string):
+		return self.spans(string) is not None
+
+	def __contains__(self, string):
+		return self.accepts(string)
+
+def _names(piece, names):
+	'''
+		Append the names of the groups in `piece` to `names`, visiting the
+		alternatives of a pattern in the same order as `_compile()`.
+	'''
+	if hasattr(piece, "multiplicand"):
+		if piece.group_name is not None:
+			if piece.group_name in names:
+				raise Exception("Redefinition of group " + repr(piece.group_name))
+			names.append(piece.group_name)
+		_names(piece.multiplicand, names)
+	elif hasattr(piece, "mults"):
+		for m in piece.mults:
+			_names(m, names)
+	elif hasattr(piece, "concs"):
+		for c in sorted(piece.concs, key=str):
+			_names(c, names)
+
+def _compile(piece, next, nfa, names):
+	'''
+		Add NFA nodes for `piece`, followed by the node `next`, to `nfa`, and
+		return the node to start at. Group k, named `names[k]`, is delimited
+		by the tags 2k and 2k + 1. A mult's multiplicand is compiled once for
+		each copy of it.
+	'''
+	if hasattr(piece, "ranges"):
+		return _add(nfa, (CHAR, piece, next))
+
+	if hasattr(piece, "multiplicand"):
+		(cand, ier) = (piece.multiplicand, piece.multiplier)
+		if piece.group_name is None:
+			def unit(next):
+				return _compile(cand, next, nfa, names)
+		else:
+			k = names.index(piece.group_name)
+			def unit(next):
+				close = _add(nfa, (TAG, 2 * k + 1, next))
+				return _add(nfa, (TAG, 2 * k, _compile(cand, close, nfa, names)))
+
+		# Which to try first: another copy, or moving on
+		def choice(another, next):
+			return [another, next] if ier.greedy else [next, another]
+
+		rest = next
+		if ier.max.v is None:
+			loop = _add(nfa, None)
+			nfa[loop] = (SPLIT, choice(unit(loop), next))
+			rest = loop
+		else:
+			for i in range(ier.optional.v):
+				rest = _add(nfa, (SPLIT, choice(unit(rest), next)))
+		for i in range(ier.mandatory.v):
+			rest = unit(rest)
+		return rest
+
+	if hasattr(piece, "mults"):
+		for m in reversed(piece.mults):
+			next = _compile(m, next, nfa, names)
+		return next
+
+	if hasattr(piece, "concs"):
+		return _add(nfa, (SPLIT, [
+			_compile(c, next, nfa, names)
+			for c in sorted(piece.concs, key=str)
+		]))
+
+	# Anchors match no characters at all
+	return next
+
+def _add(nfa, node):
+	nfa.append(node)
+	return len(nfa) - 1
+
+def _closure(nfa, start, origin, visited, threads, operations):
+	'''
+		Follow epsilon transitions from `start` depth first, in priority order,
+		appending each CHAR or MATCH node reached to `threads`, together with
+		(`origin`, tags set on the way) to `operations`. A node already in
+		`visited` was reached by a higher priority thread, which takes it.
+		Return (threads, operations) as tuples.
+	'''
+	stack = [(start, ())]
+	while len(stack) > 0:
+		(s, tags) = stack.pop()
+		if s in visited:
+			continue
+		visited.add(s)
+		node = nfa[s]
+		if node[0] == SPLIT:
+			for t in reversed(node[1]):
+				stack.append((t, tags))
+		elif node[0] == TAG:
+			stack.append((node[2], tags + (node[1],)))
+		else:
+			threads.append(s)
+			operations.append((origin, tags))
+	return (tuple(threads), tuple(operations))
+
+def _set(registers, tags, position):
+	'''Return a copy of `registers` with each of `tags` set to `position`.'''
+	if len(tags) == 0:
+		return registers
+	registers = list(registers)
+	for tag in tags:
+		registers[tag] = position
+	return tuple(registers)
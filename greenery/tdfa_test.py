@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+	raise Exception("Test files can't be run directly. Use `python -m pytest greenery`")
+
+import itertools
+import re
+from greenery.tdfa import tdfa
+
+def test_match():
+	date = tdfa("(?P<year>[0-9]{4})-(?P<month>[0-9]{2})(-(?P<day>[0-9]{2}))?")
+	assert date.names == ["year", "month", "day"]
+	assert date.match("2024-05-17") == {"year": "2024", "month": "05", "day": "17"}
+	assert date.match("2024-05") == {"year": "2024", "month": "05", "day": None}
+	assert date.spans("2024-05") == {"year": (0, 4), "month": (5, 7), "day": None}
+	assert date.match("2024-5") is None
+	assert "1999-12-31" in date
+
+	# Alternatives are ordered by their string forms, not as written
+	either = tdfa("(?P<b>b)|(?P<a>a)")
+	assert either.names == ["a", "b"]
+	assert either.match("b") == {"a": None, "b": "b"}
+
+def test_agrees_with_re():
+	# Greedy and lazy loops, optional groups, nesting and empty iterations.
+	# Alternatives are all unambiguous, since their order isn't kept
+	for string in [
+		"(?P<a>a*)(?P<b>a*)",
+		"(?P<a>a*?)(?P<b>a*)",
+		"(?P<x>a|b)*(?P<y>b*)",
+		"((?P<o>a)|b)+",
+		"(?P<a>a)?(?P<b>a?)",
+		"(?P<p>(?P<q>a)b?){1,3}",
+		"((?P<e>)a)*",
+	]:
+		t = tdfa(string)
+		r = re.compile(string)
+		for n in range(6):
+			for chars in itertools.product("ab", repeat=n):
+				s = "".join(chars)
+				m = r.fullmatch(s)
+				expected = None if m is None else dict((name, m.group(name)) for name in t.names)
+				assert t.match(s) == expected
+
+def test_redefinition():
+	try:
+		tdfa("(?P<a>x)(?P<a>y)")
+		assert False
+	except Exception as e:
+		assert str(e) == "Redefinition of group 'a'"
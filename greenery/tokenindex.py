@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+'''
+	Which tokens of a vocabulary may come next, for constrained generation.
+
+	When generating text one token at a time under the constraint that it
+	must match a regular expression, each step needs the set of vocabulary
+	tokens (multi-character strings) which lead the DFA from its current
+	state to a live one, i.e. one from which a final state can still be
+	reached. Feeding each of 50,000 tokens through the DFA at every step is
+	far too slow, but since the answer depends only on the DFA state, it can
+	be computed once for every live state.
+
+	Doing so token by token would still repeat a lot of work, since tokens
+	share prefixes. Instead, the vocabulary is put in a trie, which is walked
+	through the DFA from each live state, abandoning a branch as soon as the
+	DFA leaves the live states. For each state, the allowed token ids and the
+	states they lead to are stored in two parallel arrays, sorted by id, so
+	that the next state for a chosen token is a binary search away.
+'''
+
+from array import array
+from bisect import bisect_left
+from greenery import fsm
+
+class tokenindex:
+	'''
+		Index the strings of `vocabulary`, identified by their positions in it,
+		against `machine`, an FSM or lego piece. Empty tokens are ignored.
+		States are those of the FSM.
+	'''
+	def __setattr__(self, name, value):
+		'''Immutability prevents some potential problems.'''
+		raise Exception("This object is immutable.")
+
+	def __init__(self, machine, vocabulary):
+		if hasattr(machine, "to_fsm"):
+			machine = machine.to_fsm()
+		live = machine.live()
+
+		# States are stored in the arrays by number
+		states = sorted(live, key=repr)
+		numbers = dict((state, i) for (i, state) in enumerate(states))
+
+		root = _trie(vocabulary, machine.alphabet)
+		allowed = {}
+		for state in states:
+			ids = []
+			stack = [(root, state)]
+			while len(stack) > 0:
+				(node, current) = stack.pop()
+				transitions = machine.map.get(current, {})
+				for (symbol, child) in node[0]:
+					next = transitions.get(symbol)
+					if next is None or next not in live:
+						continue
+					for i in child[1]:
+						ids.append((i, numbers[next]))
+					stack.append((child, next))
+			ids.sort()
+			allowed[state] = (
+				array("l", [i for (i, next) in ids]),
+				array("l", [next for (i, next) in ids]),
+			)
+
+		self.__dict__["machine"] = machine
+		self.__dict__["initial"] = machine.initial
+		self.__dict__["states"] = states
+		self.__dict__["_allowed"] = allowed
+
+	def allowed(self, state):
+		'''
+			Return the sorted array of ids of the tokens which may follow
+			`state`, i.e. which lead from it to a live state. A state which
+			isn't live allows nothing.
+		'''
+		if state not in self._allowed:
+			return array("l")
+		return self._allowed[state][0]
+
+	def next(self, state, token):
+		'''
+			Return the state reached by feeding token id `token` to the FSM in
+			`state`, or None if that token isn't allowed there.
+		'''
+		if state not in self._allowed:
+			return None
+		(ids, nexts) = self._allowed[state]
+		i = bisect_left(ids, token)
+		if i == len(ids) or ids[i] != token:
+			return None
+		return self.states[nexts[i]]
+
+	def final(self, state):
+		'''Whether generation may stop in `state`.'''
+		return state in self.machine.finals
+
+def _trie(vocabulary, alphabet):
+	'''
+		Build a trie of the non-empty strings in `vocabulary`. Each node is a
+		pair: a list of (symbol, child node) pairs, where the symbol is what the
+		FSM sees for the child's character (which may be `fsm.anything_else`),
+		and the list of ids of the tokens ending at the node.
+	'''
+	fallback = fsm.anything_else in alphabet
+
+	def symbol(char):
+		if char not in alphabet and fallback:
+			return fsm.anything_else
+		return char
+
+	# Built with dicts keyed by character, then converted
+	root = ({}, [])
+	for (i, token) in enumerate(vocabulary):
+		if len(token) == 0:
+			continue
+		node = root
+		for char in token:
+			node = node[0].setdefault(char, ({}, []))
+		node[1].append(i)
+
+	def convert(node):
+		return (
+			[(symbol(char), convert(child)) for (char, child) in node[0].items()],
+			node[1],
+		)
+
+	return convert(root)
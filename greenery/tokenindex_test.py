@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+	raise Exception("Test files can't be run directly. Use `python -m pytest greenery`")
+
+from greenery.fsm import anything_else
+from greenery.lego import parse
+from greenery.tokenindex import tokenindex
+
+def test_tokenindex():
+	machine = parse("[0-9]+(\\.[0-9]+)?").to_fsm()
+	vocabulary = ["1", "12", ".", ".5", "5.", "a", "", "1.2.3", "é", "3"]
+	index = tokenindex(machine, vocabulary)
+	live = machine.live()
+	for state in index.states:
+		expected = []
+		for (i, token) in enumerate(vocabulary):
+			if token == "":
+				continue
+			current = state
+			for char in token:
+				current = machine.map.get(current, {}).get(char if char in machine.alphabet else anything_else)
+				if current is None:
+					break
+			if current is not None and current in live:
+				expected.append(i)
+				assert index.next(state, i) == current
+			else:
+				assert index.next(state, i) is None
+		assert list(index.allowed(state)) == expected
+
+def test_generation():
+	index = tokenindex(parse("(ab|cd)+"), ["ab", "a", "b", "cda", "c", "x", "abcd"])
+	assert list(index.allowed(index.initial)) == [0, 1, 3, 4, 6]
+	state = index.next(index.initial, 3)
+	assert list(index.allowed(state)) == [2]
+	state = index.next(state, 2)
+	assert index.final(state)
+	assert index.next(state, 5) is None
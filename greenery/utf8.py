@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+'''
+	Compile lego pieces into FSMs over UTF-8 bytes, so that `bytes` input can
+	be matched without decoding it first.
+
+	The pattern is first compiled into a symbolic FSM (see `sfsm`). Each
+	charclass on a transition is split into sequences of byte ranges, e.g.
+	"[\\u0080-\\u07ff]" becomes [\\xc2-\\xdf][\\x80-\\xbf]. The byte ranges are
+	spliced into a nondeterministic byte-level machine whose intermediate
+	states are shared by common suffixes; `fsm.crawl()` then takes care of
+	the common prefixes, and the result is minimised. The alphabet of the
+	result is the integers 0 to 255, which is what iterating over `bytes`
+	yields.
+'''
+
+import sys
+from greenery import fsm
+
+alphabet = set(range(256))
+
+def sequences(first, last):
+	'''
+		Split the inclusive range of code points from `first` to `last` into
+		lists of (lo, hi) byte ranges, such that the UTF-8 encodings of the
+		code points are exactly the byte strings matched by one of the lists.
+		Surrogates, which have no UTF-8 encoding, are skipped.
+	'''
+	stack = [(first, last)]
+	while len(stack) > 0:
+		(first, last) = stack.pop()
+		if first > last:
+			continue
+
+		if first <= 0xdfff and last >= 0xd800:
+			stack.append((0xe000, last))
+			stack.append((first, 0xd7ff))
+			continue
+
+		# Split where the encoded length changes
+		for boundary in (0x7f, 0x7ff, 0xffff):
+			if first <= boundary < last:
+				stack.append((boundary + 1, last))
+				stack.append((first, boundary))
+				break
+		else:
+			if last <= 0x7f:
+				yield [(first, last)]
+				continue
+
+			# Split until every byte position is a free range
+			for i in (1, 2, 3):
+				mask = (1 << (6 * i)) - 1
+				if first & ~mask != last & ~mask:
+					if first & mask != 0:
+						stack.append(((first | mask) + 1, last))
+						stack.append((first, first | mask))
+						break
+					if last & mask != mask:
+						stack.append((last & ~mask, last))
+						stack.append((first, (last & ~mask) - 1))
+						break
+			else:
+				yield list(zip(
+					bytearray(chr(first).encode("utf-8")),
+					bytearray(chr(last).encode("utf-8")),
+				))
+
+def _ranges(predicate):
+	'''The code point ranges matched by a charclass, resolving negation.'''
+	if not predicate.negated:
+		return predicate.ranges
+	ranges = []
+	next = 0
+	for (first, last) in predicate.ranges:
+		if next < first:
+			ranges.append((next, first - 1))
+		next = last + 1
+	if next <= sys.maxunicode:
+		ranges.append((next, sys.maxunicode))
+	return ranges
+
+def from_sfsm(machine):
+	'''
+		Convert a symbolic FSM into a minimal FSM over UTF-8 bytes.
+	'''
+	# Byte-level states are either ("state", s) for a state of the symbolic
+	# FSM, or (rest, s): "read the byte ranges in `rest`, then go to s". The
+	# latter are keyed on (rest, s) alone, so every sequence of continuation
+	# bytes leading to the same state is built once, however many states and
+	# code point ranges lead into it.
+	edges = {}
+
+	def add(source, rest, target):
+		(lo, hi) = rest[0]
+		if len(rest) == 1:
+			next = ("state", target)
+		else:
+			next = (tuple(rest[1:]), target)
+			if next not in edges:
+				add(next, rest[1:], target)
+		edges.setdefault(source, set()).add((lo, hi, next))
+
+	for state in machine.map:
+		for (predicate, target) in machine.map[state]:
+			for (first, last) in _ranges(predicate):
+				for rest in sequences(first, last):
+					add(("state", state), rest, target)
+
+	initial = frozenset([("state", machine.initial)])
+
+	def final(current):
+		return any(node[0] == "state" and node[1] in machine.finals for node in current)
+
+	def follow(current, byte):
+		next = frozenset(
+			target
+			for node in current
+			for (lo, hi, target) in edges.get(node, ())
+			if lo <= byte <= hi
+		)
+		if len(next) == 0:
+			raise fsm.OblivionError
+		return next
+
+	return _minimise(fsm.crawl(alphabet, initial, final, follow))
+
+def _minimise(machine):
+	'''
+		Minimise a DFA over bytes by partition refinement (Hopcroft's
+		algorithm). `fsm.reduce()` reverses the DFA twice, and each reversed
+		transition is found by searching every state, which takes minutes for
+		a few hundred states and 256 symbols. Here, the predecessors of each
+		state on each byte are indexed up front instead. Missing transitions
+		lead to an extra dead state, None, whose block is dropped at the end,
+		taking every state which can't reach a final state with it.
+	'''
+	states = sorted(machine.states, key=fsm.key) + [None]
+	symbols = sorted(machine.alphabet, key=fsm.key)
+	incoming = {}
+	for state in states:
+		transitions = machine.map.get(state, {}) if state is not None else {}
+		for symbol in symbols:
+			incoming.setdefault((symbol, transitions.get(symbol)), []).append(state)
+
+	blocks = []
+	block = {}
+	for group in (
+		[state for state in states if state in machine.finals],
+		[state for state in states if state not in machine.finals],
+	):
+		if len(group) > 0:
+			for state in group:
+				block[state] = len(blocks)
+			blocks.append(set(group))
+
+	pending = set(range(len(blocks)))
+	while len(pending) > 0:
+		splitter = list(blocks[pending.pop()])
+		for symbol in symbols:
+			# Group the predecessors of the splitter on this symbol by block
+			hits = {}
+			for state in splitter:
+				for source in incoming.get((symbol, state), ()):
+					hits.setdefault(block[source], set()).add(source)
+			for (b, hit) in hits.items():
+				if len(hit) == len(blocks[b]):
+					continue
+				blocks[b] -= hit
+				new = len(blocks)
+				blocks.append(hit)
+				for state in hit:
+					block[state] = new
+				if b in pending or len(hit) <= len(blocks[b]):
+					pending.add(new)
+				else:
+					pending.add(b)
+
+	# Number the surviving blocks in order of their first state
+	dead = block[None]
+	numbers = {}
+	for state in states:
+		if block[state] != dead:
+			numbers.setdefault(block[state], len(numbers))
+
+	map = {}
+	for state in states:
+		if block[state] == dead or numbers[block[state]] in map:
+			continue
+		map[numbers[block[state]]] = dict(
+			(symbol, numbers[block[next]])
+			for (symbol, next) in machine.map.get(state, {}).items()
+			if block[next] != dead
+		)
+
+	if block[machine.initial] == dead:
+		return fsm.null(machine.alphabet)
+	return fsm.fsm(
+		alphabet = machine.alphabet,
+		states   = set(map.keys()),
+		initial  = numbers[block[machine.initial]],
+		finals   = set(numbers[block[state]] for state in machine.finals),
+		map      = map,
+	)
+
+def to_fsm(piece):
+	'''
+		Compile a lego piece into a minimal FSM over UTF-8 bytes.
+	'''
+	return from_sfsm(piece.to_sfsm())
+
+class matcher:
+	'''
+		Match `bytes`, `bytearray` or `memoryview` input against an FSM over
+		bytes, e.g. one returned by `to_fsm()`, using a flat transition table
+		with 256 entries per state. Entries are pre-multiplied by 256 so that
+		each input byte costs one addition and one list lookup; -1 means the
+		oblivion state.
+	'''
+	def __setattr__(self, name, value):
+		'''Immutability prevents some potential problems.'''
+		raise Exception("This object is immutable.")
+
+	def __init__(self, machine):
+		if hasattr(machine, "to_sfsm"):
+			machine = to_fsm(machine)
+		if not machine.alphabet <= alphabet:
+			raise Exception("Alphabet " + repr(machine.alphabet) + " is not made of bytes")
+
+		states = sorted(machine.states, key=fsm.key)
+		number = dict((state, i) for (i, state) in enumerate(states))
+		table = [-1] * (len(states) * 256)
+		for state in machine.map:
+			base = number[state] * 256
+			for (byte, next) in machine.map[state].items():
+				table[base + byte] = number[next] * 256
+
+		self.__dict__["table"] = table
+		self.__dict__["initial"] = number[machine.initial] * 256
+		self.__dict__["finals"] = frozenset(number[state] * 256 for state in machine.finals)
+
+	def accepts(self, data):
+		'''
+			Test whether the whole of `data` is matched.
+		'''
+		table = self.table
+		state = self.initial
+		for byte in bytearray(data):
+			state = table[state + byte]
+			if state < 0:
+				return False
+		return state in self.finals
+
+	def __contains__(self, data):
+		return self.accepts(data)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+	raise Exception("Test files can't be run directly. Use `python -m pytest greenery`")
+
+from greenery.lego import parse
+from greenery.utf8 import sequences, to_fsm, matcher
+
+def test_sequences():
+	assert list(sequences(0x61, 0x7a)) == [[(0x61, 0x7a)]]
+	assert list(sequences(0x80, 0x7ff)) == [[(0xc2, 0xdf), (0x80, 0xbf)]]
+	assert list(sequences(0x7f, 0x80)) == [[(0x7f, 0x7f)], [(0xc2, 0xc2), (0x80, 0x80)]]
+	# Surrogates are skipped
+	assert list(sequences(0xd7ff, 0xe000)) == [
+		[(0xed, 0xed), (0x9f, 0x9f), (0xbf, 0xbf)],
+		[(0xee, 0xee), (0x80, 0x80), (0x80, 0x80)],
+	]
+
+def test_dot():
+	dot = to_fsm(parse("."))
+	for i in list(range(0, 0xd800, 37)) + list(range(0xe000, 0x110000, 997)):
+		assert dot.accepts(bytearray(chr(i).encode("utf-8")))
+	assert not dot.accepts(b"")
+	assert not dot.accepts(b"ab")
+	assert not dot.accepts(b"\xc0\x80") # overlong
+	assert not dot.accepts(b"\xed\xa0\x80") # surrogate
+	assert not dot.accepts(b"\xf4\x90\x80\x80") # beyond U+10FFFF
+
+def test_matcher():
+	m = matcher(parse("[^a]*b"))
+	assert m.accepts("xyz\U0001f600b".encode("utf-8"))
+	assert m.accepts(memoryview(b"b"))
+	assert not m.accepts(bytearray(b"ab"))
+	assert not m.accepts(b"\xffb")
+
+	m = matcher(to_fsm(parse("(x|ü|一|\U0001f600)+")))
+	assert "ü一x\U0001f600".encode("utf-8") in m
+	assert not "ý".encode("utf-8") in m
+	assert not b"" in m
+
+def test_minimal():
+	# Minimised without `fsm.reduce()`, but just as small
+	for string in ["[^a]*b", ".", "(ab|a)*c?", "[ab]*a[ab]{3}", "[^\x00-\U0010ffff]"]:
+		piece = parse(string)
+		bytefsm = to_fsm(piece)
+		assert len(bytefsm.states) == len(bytefsm.reduce().states)
+
+def test_from_sfsm_speed():
+	import time
+	piece = parse(
+		"(([ab]){0,2}[^a]){1,3}((([^a]a|){1,3})(.[^a])?)"
+		"|(((c)|([^a]*?|)+?[b-c]{2})+|)(([^a][b-c]{0,2}){2,})"
+	)
+	start = time.time()
+	bytefsm = to_fsm(piece)
+	assert time.time() - start < 10
+	assert len(bytefsm.states) == 227
+
+	charfsm = piece.to_fsm()
+	for string in ["", "a", "b", "bb", "bab", "abca", "ccbc", "xyz", "éé", "ba\U0001f600a", "abababab"]:
+		assert bytefsm.accepts(bytearray(string.encode("utf-8"))) == charfsm.accepts(string)